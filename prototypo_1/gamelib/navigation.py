@@ -1,24 +1,87 @@
 import heapq
-import math
 import sys
-import queue
+from collections import deque
 from .util import debug_write
 
-class Node:
-    """A pathfinding node
 
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+_ARENA_TABLES = {}
+
+def _get_arena_tables(game_map):
+    """Builds (once per arena size) the static tables the pathfinder indexes into
+
+    Tiles are addressed by their flat index ``x * ARENA_SIZE + y``.
+
+    Returns:
+        A tuple (in_bounds_indexes, neighbors). neighbors[index] is a tuple of (neighbor_index, x, y)
+        entries for the in bounds neighbors of a tile, in the order up, down, right, left.
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    size = game_map.ARENA_SIZE
+    tables = _ARENA_TABLES.get(size)
+    if tables is not None:
+        return tables
+
+    in_bounds = [False] * (size * size)
+    for x in range(size):
+        for y in range(size):
+            in_bounds[x * size + y] = game_map.in_arena_bounds([x, y])
+
+    in_bounds_indexes = tuple(index for index in range(size * size) if in_bounds[index])
+    neighbors = [()] * (size * size)
+    for index in in_bounds_indexes:
+        x, y = divmod(index, size)
+        adjacent = []
+        for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= nx < size and 0 <= ny < size and in_bounds[nx * size + ny]:
+                adjacent.append((nx * size + ny, nx, ny))
+        neighbors[index] = tuple(adjacent)
+
+    tables = (in_bounds_indexes, tuple(neighbors))
+    _ARENA_TABLES[size] = tables
+    return tables
+
+
+_ENDPOINT_TABLES = {}
+
+def _get_endpoint_tables(end_points, size):
+    """Builds (once per set of endpoints) the lookup tables used to search toward them
+
+    Returns:
+        A tuple (end_point_indexes, end_point_mask, idealness, direction, row_order). end_point_indexes
+        is a frozenset of the flat indexes of the endpoints and end_point_mask their bitboard mask.
+        idealness[index] is the idealness of every tile and direction is the [x, y] direction of the edge.
+        row_order lists the rows from most to least ideal.
+
+    """
+    key = (size,) + tuple(x * size + y for x, y in end_points)
+    tables = _ENDPOINT_TABLES.get(key)
+    if tables is not None:
+        return tables
+
+    end_point_indexes = frozenset(key[1:])
+    x, y = end_points[0]
+    direction = [1 if x >= size // 2 else -1, 1 if y >= size // 2 else -1]
+    idealness = []
+    for index in range(size * size):
+        if index in end_point_indexes:
+            idealness.append(sys.maxsize)
+            continue
+        x, y = divmod(index, size)
+        row = y if direction[1] == 1 else (size - 1 - y)
+        column = x if direction[0] == 1 else (size - 1 - x)
+        idealness.append(size * row + column)
+
+    if direction[1] == 1:
+        row_order = tuple(range(size - 1, -1, -1))
+    else:
+        row_order = tuple(range(size))
+    end_point_mask = 0
+    for index in end_point_indexes:
+        end_point_mask |= 1 << index
+
+    tables = (end_point_indexes, end_point_mask, tuple(idealness), direction, row_order)
+    _ENDPOINT_TABLES[key] = tables
+    return tables
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +91,28 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The search state lives in flat lists indexed by ``x * ARENA_SIZE + y``. They are allocated
+    the first time the map is initialized and cleared in place before every query, so repeated
+    calls to navigate_multiple_endpoints do not rebuild the map.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (list): Is there a structure at each tile
+        * visited_validate (list): Have we visited each tile during the validation step?
+        * pathlength (list): The distance between each tile and the target location, -1 if unreached
+        * next_hops (list): The tile a unit moves to next, indexed by ``tile * 3 + previous_move_direction``, -1 if not yet known
 
     """
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        self.size = 0
+        self._base_structures = None
+        self._base_fields = {}
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +120,52 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        size = game_state.ARENA_SIZE
+        if size != self.size:
+            self.size = size
+            self._in_bounds_indexes, self._neighbors = _get_arena_tables(game_state.game_map)
+            self._cleared_flags = [False] * (size * size)
+            self._cleared_pathlength = [-1] * (size * size)
+            self._cleared_next_hops = [-1] * (size * size * 3)
+            self.blocked = list(self._cleared_flags)
+            self.visited_validate = list(self._cleared_flags)
+            self.pathlength = list(self._cleared_pathlength)
+            self.next_hops = list(self._cleared_next_hops)
+        else:
+            self.blocked[:] = self._cleared_flags
+            self.visited_validate[:] = self._cleared_flags
+            self.pathlength[:] = self._cleared_pathlength
+            self.next_hops[:] = self._cleared_next_hops
+        self._searched = 0
+
+    def _set_end_points(self, end_points):
+        """Looks up the endpoint membership, idealness and direction tables for this query
+
+        """
+        (self._end_point_indexes, self._end_point_mask, self._idealness,
+            self._direction, self._row_order) = _get_endpoint_tables(end_points, self.size)
+
+    def _is_end_point(self, location):
+        return location[0] * self.size + location[1] in self._end_point_indexes
+
+    def _fill_walls(self):
+        """Marks every tile holding a structure as blocked
+
+        """
+        self._bitboard = self.game_state.game_map.get_bitboard()
+        self._open = self._bitboard.open_tiles()
+        self._set_blocked(self._bitboard.structures & self._bitboard.in_bounds)
+
+    def _set_blocked(self, structures):
+        """Sets the blocked list from a bitboard mask of structures
+
+        """
+        self.blocked[:] = self._cleared_flags
+        # Bit i of the structures mask is tile i, so the reversed binary string lists them in order
+        bits = format(structures, "b")[::-1]
+        self.blocked[:len(bits)] = [bit == "1" for bit in bits]
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -68,46 +183,249 @@ class ShortestPathFinder:
         if game_state.contains_stationary_unit(start_point):
             return
 
-        #Initialize map 
+        #Initialize map
         self.initialize_map(game_state)
+        self._set_end_points(end_points)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._fill_walls()
         #Do pathfinding
         ideal_endpoints = self._idealness_search(start_point, end_points)
         self._validate(ideal_endpoints, end_points)
         return self._get_path(start_point, end_points)
 
-    def _idealness_search(self, start, end_points):
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        Units in the same pocket of pathable space share one validation search, so this is much
+        cheaper than calling navigate_multiple_endpoints once per start point.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path for each start point, in the same order, exactly as navigate_multiple_endpoints
+            would return it. The entry is None for start points blocked by a structure.
+
         """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
-        The edge if it is available, or the best self destruct location otherwise
+        self.initialize_map(game_state)
+        self._set_end_points(end_points)
+        self._fill_walls()
+        size = self.size
+        flooded_from_edge = False
+        paths = []
+        for start_point in start_points:
+            start_index = start_point[0] * size + start_point[1]
+            if self.blocked[start_index]:
+                paths.append(None)
+                continue
+            # Every tile of a searched pocket is marked searched, and its pathlengths are already set
+            if not self._searched >> start_index & 1:
+                ideal_tile = self._idealness_search(start_point, end_points)
+                if not self._is_end_point(ideal_tile):
+                    self._validate(ideal_tile, end_points)
+                elif not flooded_from_edge:
+                    # A flood from the edge covers every pocket that touches the edge
+                    self._validate(ideal_tile, end_points)
+                    flooded_from_edge = True
+            paths.append(self._get_path(start_point, end_points))
+        return paths
+
+    def navigate_with_overrides(self, start_point, end_points, game_state, structures):
+        """Finds the path a unit would take if the structure layout were different, without changing the map
+
+        The pathlength field of the current layout is computed once and kept, then repaired for each
+        hypothetical layout by only revisiting the tiles whose distance can change. This makes scoring
+        many candidate placements against the same board much cheaper than pathing each one from scratch.
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+            * structures: A bitboard mask of the tiles that should be treated as holding a structure
+
+        Returns:
+            The path navigate_multiple_endpoints would return if the map held exactly these structures, 
+            or None if the start point is blocked.
+
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
-
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        self.initialize_map(game_state)
+        self._set_end_points(end_points)
+        self._bitboard = game_state.game_map.get_bitboard()
+        in_bounds = self._bitboard.in_bounds
+        base = self._bitboard.structures & in_bounds
+        structures &= in_bounds
+        if structures & self._bitboard.bit(start_point):
+            return
+
+        self._open = in_bounds & ~structures
+        ideal_tile = self._idealness_search(start_point, end_points)
+        if self._is_end_point(ideal_tile):
+            seeds = self._end_point_indexes
+            seed_key = self._end_point_mask
+        else:
+            seeds = frozenset([ideal_tile[0] * self.size + ideal_tile[1]])
+            seed_key = self._bitboard.bit(ideal_tile)
+
+        self.pathlength[:] = self._get_base_field(base, seed_key, ideal_tile, end_points)
+        added = structures & ~base
+        removed = base & ~structures
+        self._set_blocked(base | added)
+        if added:
+            self._repair_added(added, seeds)
+        if removed:
+            self._set_blocked(structures)
+            self._repair_removed(removed, seeds)
+        return self._get_path(start_point, end_points)
+
+    def _get_base_field(self, base, seed_key, ideal_tile, end_points):
+        """Gets the pathlength field of the current layout for a set of seeds, computing it once per layout
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+        """
+        if base != self._base_structures:
+            self._base_structures = base
+            self._base_fields = {}
+        field = self._base_fields.get(seed_key)
+        if field is None:
+            self._set_blocked(base)
+            self._validate(ideal_tile, end_points)
+            field = self.pathlength[:]
+            self._base_fields[seed_key] = field
+        return field
+
+    def _mask_indexes(self, mask):
+        """Gets the flat indexes of the tiles in a bitboard mask
+
+        """
+        indexes = []
+        while mask:
+            low_bit = mask & -mask
+            indexes.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return indexes
 
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
+    def _repair_added(self, added, seeds):
+        """Updates the pathlengths after the tiles in the added mask became blocked
+
+        Only tiles that lost every shortest route to a seed are recomputed. Blocked must already include the added tiles.
+        """
+        pathlength = self.pathlength
+        blocked = self.blocked
+        neighbors = self._neighbors
+
+        #Find the tiles whose distance grew, in order of their old distance
+        affected = set()
+        candidates = {}
+        for index in self._mask_indexes(added):
+            old_pathlength = pathlength[index]
+            if old_pathlength < 0:
+                continue
+            if index not in seeds:
+                affected.add(index)
+            for neighbor, _, _ in neighbors[index]:
+                if pathlength[neighbor] == old_pathlength + 1:
+                    candidates.setdefault(old_pathlength + 1, []).append(neighbor)
+
+        distance = min(candidates) if candidates else 0
+        while candidates:
+            for index in candidates.pop(distance, ()):
+                if index in affected or blocked[index] or index in seeds:
+                    continue
+                supported = False
+                for neighbor, _, _ in neighbors[index]:
+                    if pathlength[neighbor] == distance - 1 and not blocked[neighbor] and neighbor not in affected:
+                        supported = True
+                        break
+                if supported:
+                    continue
+                affected.add(index)
+                for neighbor, _, _ in neighbors[index]:
+                    if pathlength[neighbor] == distance + 1:
+                        candidates.setdefault(distance + 1, []).append(neighbor)
+            distance += 1
+
+        #Recompute them outward from the tiles that kept their distance
+        for index in affected:
+            pathlength[index] = -1
+        frontier = []
+        for index in affected:
+            if blocked[index]:
+                continue
+            best = -1
+            for neighbor, _, _ in neighbors[index]:
+                if not blocked[neighbor] and pathlength[neighbor] >= 0 and (best < 0 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if best >= 0:
+                frontier.append((best, index))
+        heapq.heapify(frontier)
+        while frontier:
+            current_pathlength, index = heapq.heappop(frontier)
+            if pathlength[index] >= 0:
+                continue
+            pathlength[index] = current_pathlength
+            for neighbor, _, _ in neighbors[index]:
+                if neighbor in affected and pathlength[neighbor] < 0 and not blocked[neighbor]:
+                    heapq.heappush(frontier, (current_pathlength + 1, neighbor))
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+    def _repair_removed(self, removed, seeds):
+        """Updates the pathlengths after the tiles in the removed mask became open
 
-        return most_ideal
+        Distances can only shrink, so they are relaxed outward from the opened tiles. Blocked must already exclude them.
+        """
+        pathlength = self.pathlength
+        blocked = self.blocked
+        neighbors = self._neighbors
+
+        frontier = []
+        for index in self._mask_indexes(removed):
+            if index in seeds:
+                frontier.append((0, index))
+                continue
+            for neighbor, _, _ in neighbors[index]:
+                if not blocked[neighbor] and pathlength[neighbor] >= 0 and (pathlength[index] < 0 or pathlength[neighbor] + 1 < pathlength[index]):
+                    pathlength[index] = pathlength[neighbor] + 1
+            if pathlength[index] >= 0:
+                frontier.append((pathlength[index], index))
+        heapq.heapify(frontier)
+        while frontier:
+            current_pathlength, index = heapq.heappop(frontier)
+            if current_pathlength > pathlength[index]:
+                continue
+            for neighbor, _, _ in neighbors[index]:
+                if blocked[neighbor]:
+                    continue
+                if pathlength[neighbor] < 0 or pathlength[neighbor] > current_pathlength + 1:
+                    pathlength[neighbor] = current_pathlength + 1
+                    heapq.heappush(frontier, (current_pathlength + 1, neighbor))
+
+    def _idealness_search(self, start, end_points):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
+        The edge if it is available, or the best self destruct location otherwise
+        """
+        #The pocket is found with a bitboard flood fill, then scanned from the most ideal row down
+        size = self.size
+        bitboard = self._bitboard
+        pocket = bitboard.flood(bitboard.bit(start), self._open)
+        self._searched |= pocket
+
+        reached_end_points = pocket & self._end_point_mask
+        if reached_end_points:
+            index = (reached_end_points & -reached_end_points).bit_length() - 1
+            return [index // size, index % size]
+
+        rows = bitboard.rows
+        prefer_high_x = self._direction[0] == 1
+        for y in self._row_order:
+            tiles = pocket & rows[y]
+            if tiles:
+                if prefer_high_x:
+                    index = tiles.bit_length() - 1
+                else:
+                    index = (tiles & -tiles).bit_length() - 1
+                return [index // size, index % size]
+        return start
 
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
@@ -119,7 +437,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -136,27 +454,13 @@ class ShortestPathFinder:
 
     def _get_idealness(self, location, end_points):
         """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        Better self destruct locations are more ideal. The endpoints are perfectly ideal.
 
         Returns:
             A location the unit will attempt to reach
         """
-        if location in end_points:
-            return sys.maxsize
-
-        direction = self._get_direction_from_endpoints(end_points)
-
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
+        idealness = _get_endpoint_tables(end_points, self.game_state.ARENA_SIZE)[2]
+        return idealness[location[0] * self.game_state.ARENA_SIZE + location[1]]
 
     def _validate(self, ideal_tile, end_points):
         """Breadth first search of the grid, setting the pathlengths of each node
@@ -164,31 +468,34 @@ class ShortestPathFinder:
         """
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
-        else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+        size = self.size
+        blocked = self.blocked
+        visited = self.visited_validate
+        pathlength = self.pathlength
+        neighbors = self._neighbors
+
+        current = deque()
+        seeds = end_points if self._is_end_point(ideal_tile) else [ideal_tile]
+        for location in seeds:
+            index = location[0] * size + location[1]
+            #Set current pathlength to 0
+            pathlength[index] = 0
+            visited[index] = True
+            current.append(index)
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            current_index = current.popleft()
+            #Blocked endpoints are seeded but never expanded
+            if blocked[current_index]:
+                continue
+            next_pathlength = pathlength[current_index] + 1
+            for neighbor, _, _ in neighbors[current_index]:
+                if blocked[neighbor] or visited[neighbor]:
                     continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                visited[neighbor] = True
+                current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
@@ -197,49 +504,57 @@ class ShortestPathFinder:
     def _get_path(self, start_point, end_points):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
+        The next move only depends on the tile and the direction of the previous move, so each choice
+        is stored in next_hops the first time it is made. Every later path through the same tile and
+        direction is a table lookup until the map is initialized again.
         """
         #GET THE PATH
+        size = self.size
+        pathlength = self.pathlength
+        next_hops = self.next_hops
         path = [start_point]
-        current = start_point
+        index = start_point[0] * size + start_point[1]
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not pathlength[index] == 0:
+            hop = index * 3 + move_direction
+            next_index = next_hops[hop]
+            if next_index < 0:
+                next_move = self._choose_next_move([index // size, index % size], move_direction, end_points)
+                next_index = next_move[0] * size + next_move[1]
+                next_hops[hop] = next_index
 
-            if current[0] == next_move[0]:
+            #Moving by one along the flat index keeps x the same
+            if next_index - index == 1 or index - next_index == 1:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
-            current = next_move
-        
-        #debug_write(path)
+            path.append([next_index // size, next_index % size])
+            index = next_index
+
         return path
-  
+
     def _choose_next_move(self, current_point, previous_move_direction, end_points):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        size = self.size
+        blocked = self.blocked
+        pathlength = self.pathlength
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_point[0] * size + current_point[1]]
+        for neighbor_index, x, y in self._neighbors[current_point[0] * size + current_point[1]]:
+            if blocked[neighbor_index]:
                 continue
 
             new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            neighbor = [x, y]
+            current_pathlength = pathlength[neighbor_index]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
             elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
                 new_best = True
 
             #Filter by direction based on prev move
@@ -249,7 +564,6 @@ class ShortestPathFinder:
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
     def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
@@ -261,26 +575,26 @@ class ShortestPathFinder:
         if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
             #We want to go up now. If we have not changed our y, we are not going up
             if prev_tile[1] == new_tile[1]:
-                return False 
+                return False
             return True
         if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
             if prev_tile[0] == new_tile[0]:
                 #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_tile[1] == new_tile[1]:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
+
+        #To make it here, both moves are on the same axis
+        direction = self._direction
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
+                return True
             if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
+                return True
+            return False
         if new_tile[0] == prev_best[0]: #If they both moved vertical...
             if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
                 return True
@@ -297,11 +611,12 @@ class ShortestPathFinder:
             debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
             return
 
-        for y in range(28):
-            for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+        size = self.size
+        for y in range(size):
+            for x in range(size):
+                index = x * size + (size - y - 1)
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -4,7 +4,7 @@ import sys
 
 from .navigation import ShortestPathFinder
 from .util import send_command, debug_write
-from .unit import GameUnit
+from .unit import GameUnit, _get_unit_class
 from .game_map import GameMap
 
 def is_stationary(unit_type):
@@ -44,6 +44,8 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache_hits (int): The number of find_path_to_edge calls answered from the path cache
+        * path_cache_misses (int): The number of find_path_to_edge calls that had to run the pathfinder
 
     """
 
@@ -52,7 +54,8 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string or dict): The game state at the start of this turn, either as the json string 
+              sent by the engine or as the dict AlgoCore already decoded from it
 
         """
         self.serialized_string = serialized_string
@@ -91,6 +94,11 @@ class GameState:
 
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
+        self._path_cache = {}
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+        self._max_attack_range = None
+        self._attacker_types = None
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -101,9 +109,9 @@ class GameState:
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, or the dict decoded from one.
         """
-        state = json.loads(state_line)
+        state = json.loads(state_line) if isinstance(state_line, str) else state_line
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -131,23 +139,30 @@ class GameState:
         Helper function for __parse_state to add units to the map.
         """
         typedef = self.config.get("unitInformation")
+        config = self.config
+        game_map = self.game_map
         for i, unit_types in enumerate(units):
-            for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
-                # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
-                    # Quick fix will deploy engine fix soon
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
-                elif unit_type == UPGRADE:
+            if not unit_types:
+                continue
+            unit_type = typedef[i].get("shorthand")
+            # This depends on RM and UP always being the last types to be processed
+            if unit_type == REMOVE or unit_type == UPGRADE:
+                for uinfo in unit_types:
+                    x, y = int(uinfo[0]), int(uinfo[1])
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
-                else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                        if unit_type == REMOVE:
+                            # Quick fix will deploy engine fix soon
+                            game_map[x,y][0].pending_removal = True
+                        else:
+                            game_map[x,y][0].upgrade()
+                continue
+            unit_class = _get_unit_class(unit_type, config)
+            for uinfo in unit_types:
+                x, y, hp = uinfo[0], uinfo[1], uinfo[2]
+                # The engine sends integer coordinates, only convert if it did not
+                if type(x) is not int or type(y) is not int:
+                    x, y = int(x), int(y)
+                game_map[x,y].append(unit_class(unit_type, config, player_number, float(hp), x, y))
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -333,7 +348,8 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        edge = self.game_map.get_edge_id(location)
+        on_edge = edge == self.game_map.BOTTOM_LEFT or edge == self.game_map.BOTTOM_RIGHT
 
         if self.enable_warnings:
             fail_reason = ""
@@ -441,7 +457,7 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.game_map.upgrade_unit([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
@@ -491,8 +507,148 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        # Paths are cached per structure layout, so changing the map through add_unit, remove_unit or
+        # attempt_spawn changes the key and stale paths are never returned
+        key = (self.game_map.structure_fingerprint(), start_location[0], start_location[1], target_edge)
+        path = self._path_cache.get(key)
+        if path is None:
+            self.path_cache_misses += 1
+            end_points = self.game_map._edge_tiles(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            self._path_cache[key] = path
+        else:
+            self.path_cache_hits += 1
+        return [list(location) for location in path]
+
+    def find_paths_to_edge(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take, in one pass.
+
+        Gives the same results as calling find_path_to_edge for each location, but 
+        locations that share a pocket of pathable space and a target edge share one search.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+
+        Returns:
+            A list with the path for each start location, in the same order. 
+            The entry is None for locations blocked by a structure.
+
+        """
+        fingerprint = self.game_map.structure_fingerprint()
+        paths = [None] * len(start_locations)
+        pending = {}
+        for i, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            path = self._path_cache.get((fingerprint, start_location[0], start_location[1], edge))
+            if path is None:
+                pending.setdefault(edge, []).append(i)
+            else:
+                self.path_cache_hits += 1
+                paths[i] = [list(location) for location in path]
+
+        for edge, indexes in pending.items():
+            end_points = self.game_map._edge_tiles(edge)
+            starts = [start_locations[i] for i in indexes]
+            found = self._shortest_path_finder.navigate_multiple_starts(starts, end_points, self)
+            for i, path in zip(indexes, found):
+                self.path_cache_misses += 1
+                self._path_cache[(fingerprint, start_locations[i][0], start_locations[i][1], edge)] = path
+                paths[i] = [list(location) for location in path]
+        return paths
+
+    def find_path_with_overrides(self, start_location, add=None, remove=None, target_edge=None):
+        """Gets the path a unit would take if structures were added or removed, without changing the map.
+
+        Use this to score candidate placements instead of calling game_map.add_unit and remove_unit 
+        around find_path_to_edge. The current board's path field is computed once and then repaired 
+        for each hypothetical board, so hundreds of candidates can be checked per turn.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            add: A list of locations to treat as holding a structure
+            remove: A list of locations to treat as empty. It is applied after add, so a location in both is empty
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            A list of locations corresponding to the path the unit would take on the hypothetical board, 
+            or None if the start location would be blocked
+
+        """
+        bitboard = self.game_map.get_bitboard()
+        for location in (add or []) + (remove or []):
+            if not self.game_map.in_arena_bounds(location):
+                self.warn("Location {} is not in the arena bounds.".format(location))
+                return
+        structures = (bitboard.structures | bitboard.mask(add or [])) & ~bitboard.mask(remove or [])
+        if structures & bitboard.bit(start_location):
+            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return
+
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        return [list(location) for location in self._path_for_structures(structures, start_location, target_edge)]
+
+    def _path_for_structures(self, structures, start_location, target_edge):
+        """The cached path on the board whose structures are the bitboard mask structures, shared with the simulator
+
+        """
+        # Hypothetical boards share the path cache, they are keyed by their structure mask
+        key = (structures, start_location[0], start_location[1], target_edge)
+        path = self._path_cache.get(key)
+        if path is None:
+            self.path_cache_misses += 1
+            end_points = self.game_map._edge_tiles(target_edge)
+            path = self._shortest_path_finder.navigate_with_overrides(start_location, end_points, self, structures)
+            self._path_cache[key] = path
+        else:
+            self.path_cache_hits += 1
+        return path
+
+    def clear_path_cache(self):
+        """Forgets every path stored by find_path_to_edge
+
+        Only needed after editing the unit lists returned by game_map[x, y] directly, 
+        changes made through add_unit, remove_unit and attempt_spawn are picked up automatically.
+        """
+        self._path_cache = {}
+
+    def set_path_finder(self, path_finder):
+        """Replaces the pathfinder used by the pathing functions
+
+        Args:
+            path_finder: A ShortestPathFinder, or a subclass such as wavefront.WavefrontPathFinder.
+            It must return the same paths, so cached paths are kept.
+
+        """
+        self._shortest_path_finder = path_finder
+
+    def can_reach_edge(self, start_location, target_edge=None):
+        """Checks if a unit at a given location could reach its target edge. 
+        Uses a bitboard flood fill, so it is much cheaper than find_path_to_edge.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            True if the edge can be reached, False if the unit would have to self destruct or the start is blocked
+
+        """
+        if self.contains_stationary_unit(start_location):
+            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return False
+
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        bitboard = self.game_map.get_bitboard()
+        reachable = bitboard.flood(bitboard.bit(start_location))
+        return reachable & bitboard.mask(self.game_map._edge_tiles(target_edge)) != 0
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -627,17 +783,26 @@ class GameState:
         if not self.game_map.in_arena_bounds(location):
             self.warn("Location {} is not in the arena bounds.".format(location))
 
+        if self._max_attack_range is None:
+            max_range = 0
+            self._attacker_types = []
+            for unit in self.config["unitInformation"]:
+                if unit.get('attackRange', 0) >= max_range:
+                    max_range = unit.get('attackRange', 0)
+                upgrade = unit.get('upgrade', {})
+                for damage in ('attackDamageWalker', 'attackDamageTower'):
+                    if unit.get(damage, 0) > 0 or upgrade.get(damage, 0) > 0:
+                        self._attacker_types.append(unit.get('shorthand'))
+                        break
+            self._max_attack_range = max_range
+        # Units are in range if within their attack range and the search area of the longest base range
+        search_radius = self._max_attack_range + self.config["unitInformation"][0]['getHitRadius']
+
         attackers = []
-        """
-        Get locations in the range of TURRET units
-        """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
-            for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+        enemy_index = 1 - player_index if player_index == 0 or player_index == 1 else None
+        for unit in self.game_map.get_units(enemy_index, self._attacker_types):
+            if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index:
+                distance = self.game_map.distance_between_locations(location, [unit.x, unit.y])
+                if distance <= unit.attackRange and distance < search_radius:
                     attackers.append(unit)
         return attackers
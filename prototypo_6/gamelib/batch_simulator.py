@@ -0,0 +1,309 @@
+"""
+Optional NumPy backend for simulating many attack plans at once.
+
+A BatchSimulator plays out the action phase of N candidate deploy plans against the same board in
+lockstep. Positions, health, path progress and shields of every unit of every plan live in (N, units)
+arrays, and each frame's movement, shielding, targeting and damage are a handful of array operations
+for all plans together. Targets are picked with the same priorities as get_target by sorting the
+attacker and target pairs in range, once per stack of units on a tile rather than once per unit. The
+only Python work left per frame is re-pathing stacks after a structure falls, which goes through the
+same path cache as the ActionSimulator.
+
+The plans are your deploys only. Your opponent has no mobile units on the board during your turn,
+so enemy turrets fire at your units and your units fire at enemy structures, and nothing attacks
+your own structures. Results match ActionSimulator.run for each plan.
+
+NumPy is not required by the rest of gamelib. If it is not installed, HAS_NUMPY is False and creating
+a BatchSimulator raises an ImportError.
+"""
+from .simulator import ActionSimulator
+from .wavefront import HAS_NUMPY, np, masks_to_arrays
+
+
+class BatchResult(object):
+    """The outcomes of a batch of simulated plans, each attribute is an array indexed by plan
+
+    Attributes :
+        * frames (array): The number of frames played for each plan
+        * breaches (array): The number of your units that reached their target edge
+        * breach_damage (array): The health your opponent lost to breaches
+        * damage_dealt (array): The damage your units dealt to enemy structures, self destructs included
+        * structure_damage (array): Same as damage_dealt, your units can only damage structures during your own turn
+        * damage_taken (array): The damage enemy turrets dealt to your units
+        * destroyed (array): The number of enemy structures destroyed
+        * self_destructs (array): The number of your units that self destructed
+        * remaining (array): The number of your units still on the board when the simulation stopped
+
+    """
+    def __init__(self, plans):
+        self.frames = np.zeros(plans, dtype=int)
+        self.breaches = np.zeros(plans, dtype=int)
+        self.breach_damage = np.zeros(plans)
+        self.damage_dealt = np.zeros(plans)
+        self.structure_damage = self.damage_dealt
+        self.damage_taken = np.zeros(plans)
+        self.destroyed = np.zeros(plans, dtype=int)
+        self.self_destructs = np.zeros(plans, dtype=int)
+        self.remaining = np.zeros(plans, dtype=int)
+
+
+_RANGE_TABLES = {}
+
+
+def _first_of_groups(groups, keys):
+    """Sorts candidates by group then by keys, most significant key last, and returns the index of the first candidate of each group"""
+    order = np.lexsort(keys + [groups])
+    sorted_groups = groups[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    return order[first]
+
+
+class BatchSimulator(ActionSimulator):
+    """Simulates many deploy plans against the same board in one call
+
+    It takes the same snapshot as an ActionSimulator, and run() still simulates a single plan.
+    Paths are kept between calls to run_many(), and the tables of the tiles in range of each tile
+    are built once per range for every simulator.
+
+    """
+    def __init__(self, game_state, max_frames=400):
+        if not HAS_NUMPY:
+            raise ImportError("BatchSimulator requires numpy")
+        super().__init__(game_state, max_frames)
+        size = self._size
+        self._tiles = size * size
+        self._in_bounds_tiles = [tile for tile in range(self._tiles) if game_state.game_map.in_arena_bounds([tile // size, tile % size])]
+        self._edge_table = masks_to_arrays(self._edge_masks, size).reshape(4, self._tiles)
+        self._path_ids = {}
+        self._path_list = []
+        self._path_table = None
+        self._path_lengths = None
+
+    def _range_table(self, radius):
+        """A (tiles, tiles) boolean array, [a, b] being whether tile b is in range of tile a"""
+        key = (self._size, radius, self._config["unitInformation"][0]["getHitRadius"])
+        table = _RANGE_TABLES.get(key)
+        if table is None:
+            masks = [0] * self._tiles
+            for tile in self._in_bounds_tiles:
+                masks[tile] = self._range_mask(tile, radius)
+            table = masks_to_arrays(masks, self._size).reshape(self._tiles, self._tiles)
+            table.flags.writeable = False
+            _RANGE_TABLES[key] = table
+        return table
+
+    def _path_id(self, structures, tile, target_edge):
+        key = (structures, tile, target_edge)
+        path_id = self._path_ids.get(key)
+        if path_id is None:
+            path_id = len(self._path_list)
+            self._path_list.append(self._path(structures, tile, target_edge))
+            self._path_ids[key] = path_id
+        return path_id
+
+    def _get_path_table(self):
+        """The (paths, longest path) array of path tiles and the length of each path"""
+        if self._path_table is None or len(self._path_table) != len(self._path_list):
+            longest = max(len(path) for path in self._path_list)
+            table = np.zeros((len(self._path_list), longest), dtype=int)
+            for path_id, path in enumerate(self._path_list):
+                table[path_id, :len(path)] = path
+            self._path_table = table
+            self._path_lengths = np.array([len(path) for path in self._path_list])
+        return self._path_table, self._path_lengths
+
+    def run_many(self, plans):
+        """Simulates every plan against the snapshot
+
+        Args:
+            * plans: A list of plans, each a list of (unit_type, location, num) deploys like the deploys of run().
+              Mobile units you already spawned with attempt_spawn are part of every plan
+
+        Returns:
+            A BatchResult
+
+        """
+        size = self._size
+        plan_count = len(plans)
+        result = BatchResult(plan_count)
+        if plan_count == 0:
+            return result
+
+        # Enemy structures, and the turrets and supports among the structures, in snapshot order
+        enemy = [(tile, rules, health) for tile, player_index, rules, health in self._structures if player_index == 1]
+        structure_tiles = np.array([tile for tile, _, _ in enemy], dtype=int)
+        structure_x = structure_tiles // size
+        structure_y = structure_tiles % size
+        structure_health = np.tile(np.array([health for _, _, health in enemy], dtype=float), (plan_count, 1))
+        structure_alive = np.ones((plan_count, len(enemy)), dtype=bool)
+        turrets = [index for index, (_, rules, _) in enumerate(enemy) if rules.damage_i]
+        turret_range = np.array([self._range_table(enemy[index][1].attack_range)[enemy[index][0]] for index in turrets], dtype=bool).reshape(len(turrets), self._tiles)
+        turret_damage = np.array([enemy[index][1].damage_i for index in turrets], dtype=float)
+        turret_x = structure_x[turrets]
+        turret_y = structure_y[turrets]
+        supports = [(tile, rules) for tile, player_index, rules, _ in self._structures
+                    if player_index == 0 and (rules.shield_per_unit or rules.shield_bonus_per_y)]
+        support_range = np.array([self._range_table(rules.shield_range)[tile] for tile, rules in supports], dtype=bool).reshape(len(supports), self._tiles)
+        support_amount = [rules.shield_per_unit + rules.shield_bonus_per_y * (tile % size) for tile, rules in supports]
+
+        # Your units, padded to the largest plan
+        snapshot = [(rules, location, health) for rules, player_index, location, health in self._mobiles if player_index == 0]
+        unit_plans = []
+        for plan in plans:
+            units = list(snapshot)
+            for entry in plan:
+                unit_type, location = entry[0], entry[1]
+                if self._base_structures >> (location[0] * size + location[1]) & 1:
+                    continue
+                rules = self._get_rules(unit_type)
+                units += [(rules, location, rules.max_health)] * (entry[2] if len(entry) > 2 else 1)
+            unit_plans.append(units)
+        unit_count = max(1, max(len(units) for units in unit_plans))
+        types = []
+        type_index = np.zeros((plan_count, unit_count), dtype=int)
+        tile = np.zeros((plan_count, unit_count), dtype=int)
+        health = np.zeros((plan_count, unit_count))
+        target_edge = np.zeros((plan_count, unit_count), dtype=int)
+        alive = np.zeros((plan_count, unit_count), dtype=bool)
+        for plan_index, units in enumerate(unit_plans):
+            for unit_index, (rules, location, unit_health) in enumerate(units):
+                if rules not in types:
+                    types.append(rules)
+                type_index[plan_index, unit_index] = types.index(rules)
+                tile[plan_index, unit_index] = location[0] * size + location[1]
+                health[plan_index, unit_index] = unit_health
+                target_edge[plan_index, unit_index] = self.game_state.get_target_edge(location)
+                alive[plan_index, unit_index] = True
+        if not types:
+            return result
+        move_interval = np.array([rules.move_interval for rules in types])[type_index]
+        damage_f = np.array([rules.damage_f for rules in types], dtype=float)[type_index]
+        breach_damage = np.array([rules.breach_damage for rules in types], dtype=float)[type_index]
+        self_destruct_steps = np.array([rules.self_destruct_steps for rules in types])[type_index]
+        self_destruct_damage = np.array([rules.self_destruct_damage_f for rules in types], dtype=float)[type_index]
+        attack_ranges = np.array([self._range_table(rules.attack_range)[:, structure_tiles] for rules in types], dtype=bool)
+        self_destruct_ranges = np.array([self._range_table(rules.self_destruct_range)[:, structure_tiles] for rules in types], dtype=bool)
+        next_move = move_interval.copy()
+        steps = np.zeros((plan_count, unit_count), dtype=int)
+        path_id = np.zeros((plan_count, unit_count), dtype=int)
+        path_index = np.zeros((plan_count, unit_count), dtype=int)
+        needs_path = alive.copy()
+        shielded = np.zeros((len(supports), plan_count, unit_count), dtype=bool)
+        layouts = [self._base_structures] * plan_count
+        plan_indexes = np.arange(plan_count)
+        center = self._center
+
+        frame = 0
+        while frame < self.max_frames:
+            playing = alive.any(axis=1)
+            if not playing.any():
+                break
+            frame += 1
+            result.frames[playing] = frame
+
+            # Movement, breaches and self destructs
+            due = alive & (next_move <= frame)
+            if due.any():
+                pathing = due & needs_path
+                if pathing.any():
+                    # Units of a plan sharing a tile and a target edge share a path
+                    plan_pathing, unit_pathing = np.nonzero(pathing)
+                    code = (plan_pathing * self._tiles + tile[pathing]) * 4 + target_edge[pathing]
+                    codes, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+                    ids = np.array([self._path_id(layouts[plan_pathing[index]], int(tile[plan_pathing[index], unit_pathing[index]]),
+                                                  int(target_edge[plan_pathing[index], unit_pathing[index]])) for index in first])
+                    path_id[pathing] = ids[inverse.reshape(-1)]
+                    path_index[pathing] = 0
+                needs_path &= ~due
+                path_table, path_lengths = self._get_path_table()
+                next_move[due] += move_interval[due]
+                moving = due & (path_index + 1 < path_lengths[path_id])
+                path_index[moving] += 1
+                tile[moving] = path_table[path_id[moving], path_index[moving]]
+                steps[moving] += 1
+                ending = due & ~moving
+                if ending.any():
+                    at_edge = self._edge_table[target_edge, tile]
+                    breached = ending & at_edge
+                    result.breaches += breached.sum(axis=1)
+                    result.breach_damage += (breach_damage * breached).sum(axis=1)
+                    result.self_destructs += (ending & ~at_edge).sum(axis=1)
+                    exploding = ending & ~at_edge & (steps >= self_destruct_steps)
+                    if exploding.any():
+                        hits = self_destruct_ranges[type_index, tile] & exploding[:, :, None] & structure_alive[:, None, :]
+                        damage = (hits * self_destruct_damage[:, :, None]).sum(axis=1)
+                        structure_health -= damage
+                        result.damage_dealt += damage.sum(axis=1)
+                    alive &= ~ending
+
+            # Shields, each support shields each unit once
+            if supports:
+                newly = support_range[:, tile] & alive & ~shielded
+                # Shields are added support by support, in the order the ActionSimulator adds them
+                for support_index in np.nonzero(newly.any(axis=(1, 2)))[0]:
+                    health += newly[support_index] * support_amount[support_index]
+                shielded |= newly
+
+            # Attacks, every target is picked before damage is dealt. Units of a plan on the same tile are
+            # indistinguishable to a turret but for their health, and units of a plan with the same type and
+            # tile all pick the same structure, so targets are picked once per group of units
+            plan_alive, unit_alive = np.nonzero(alive)
+            tile_alive = tile[plan_alive, unit_alive]
+            turret_hits = None
+            if turrets and len(plan_alive):
+                # The unit a turret would pick on each tile, the lowest health then the first one
+                code = plan_alive * self._tiles + tile_alive
+                order = np.lexsort([unit_alive, health[plan_alive, unit_alive], code])
+                first = np.ones(len(order), dtype=bool)
+                first[1:] = code[order][1:] != code[order][:-1]
+                group_plan = plan_alive[order[first]]
+                group_unit = unit_alive[order[first]]
+                group_tile = tile_alive[order[first]]
+                turret_hit, group_hit = np.nonzero(turret_range[:, group_tile] & structure_alive[group_plan][:, turrets].T)
+                if len(turret_hit):
+                    x = group_tile[group_hit] // size
+                    y = group_tile[group_hit] % size
+                    distance = (turret_x[turret_hit] - x) ** 2 + (turret_y[turret_hit] - y) ** 2
+                    # Enemy turrets prefer the nearest unit, then the lowest health, the highest y, the furthest from the center column, the first tile
+                    picked = _first_of_groups(group_plan[group_hit] * len(turrets) + turret_hit,
+                                              [group_tile[group_hit], -np.abs(center - x), -y, health[group_plan[group_hit], group_unit[group_hit]], distance])
+                    turret_hits = (group_plan[group_hit[picked]], group_unit[group_hit[picked]], turret_damage[turret_hit[picked]])
+            unit_hits = None
+            attacking = damage_f[plan_alive, unit_alive] > 0
+            if len(enemy) and attacking.any():
+                code = (plan_alive[attacking] * len(types) + type_index[plan_alive, unit_alive][attacking]) * self._tiles + tile_alive[attacking]
+                codes, first, counts = np.unique(code, return_index=True, return_counts=True)
+                group_plan = plan_alive[attacking][first]
+                group_unit = unit_alive[attacking][first]
+                group_tile = tile_alive[attacking][first]
+                group_hit, structure_hit = np.nonzero(attack_ranges[type_index[group_plan, group_unit], group_tile] & structure_alive[group_plan])
+                if len(group_hit):
+                    x = structure_x[structure_hit]
+                    y = structure_y[structure_hit]
+                    distance = (x - group_tile[group_hit] // size) ** 2 + (y - group_tile[group_hit] % size) ** 2
+                    picked = _first_of_groups(group_hit, [structure_hit, -np.abs(center - x), y, structure_health[group_plan[group_hit], structure_hit], distance])
+                    group_hit = group_hit[picked]
+                    unit_hits = (group_plan[group_hit], structure_hit[picked], damage_f[group_plan[group_hit], group_unit[group_hit]] * counts[group_hit])
+            if turret_hits is not None:
+                plan_hit, unit_hit, damage = turret_hits
+                np.subtract.at(health, (plan_hit, unit_hit), damage)
+                result.damage_taken += np.bincount(plan_hit, damage, plan_count)
+            if unit_hits is not None:
+                plan_hit, structure_hit, damage = unit_hits
+                np.subtract.at(structure_health, (plan_hit, structure_hit), damage)
+                result.damage_dealt += np.bincount(plan_hit, damage, plan_count)
+
+            # Destroyed units are removed, and units re-path if the structure layout of their plan changed
+            alive &= health > 0
+            fallen = structure_alive & (structure_health <= 0)
+            if fallen.any():
+                structure_alive &= ~fallen
+                result.destroyed += fallen.sum(axis=1)
+                for plan_index in plan_indexes[fallen.any(axis=1)]:
+                    for fallen_tile in structure_tiles[fallen[plan_index]]:
+                        layouts[plan_index] &= ~(1 << int(fallen_tile))
+                    needs_path[plan_index] = True
+
+        result.remaining = alive.sum(axis=1)
+        return result
@@ -1,7 +1,108 @@
 import math
+from .bitboard import BitBoard
 from .unit import GameUnit
 from .util import debug_write
 
+
+def _compute_in_arena_bounds(x, y, arena_size):
+    half_board = arena_size // 2
+
+    row_size = y + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < half_board and x >= startx and x <= endx)
+
+    row_size = (arena_size - 1 - y) + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= half_board and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+
+_IN_BOUNDS_TABLES = {}
+
+def _get_in_bounds_table(arena_size):
+    """Builds (once per arena size) a tuple telling if each tile is on the board, indexed by ``x * arena_size + y``
+
+    """
+    table = _IN_BOUNDS_TABLES.get(arena_size)
+    if table is None:
+        table = tuple(_compute_in_arena_bounds(x, y, arena_size) for x in range(arena_size) for y in range(arena_size))
+        _IN_BOUNDS_TABLES[arena_size] = table
+    return table
+
+
+_LOCATION_TABLES = {}
+
+def _get_location_tables(arena_size):
+    """Builds (once per arena size) the in bounds locations of the whole board, the bottom half and the top half
+
+    Each is a tuple of (x, y) locations ordered by row, then by x, which is the order GameMap iteration has always used.
+    """
+    tables = _LOCATION_TABLES.get(arena_size)
+    if tables is None:
+        in_bounds = _get_in_bounds_table(arena_size)
+        half_board = arena_size // 2
+        locations = tuple((x, y) for y in range(arena_size) for x in range(arena_size) if in_bounds[x * arena_size + y])
+        tables = (locations, tuple(location for location in locations if location[1] < half_board),
+                  tuple(location for location in locations if location[1] >= half_board))
+        _LOCATION_TABLES[arena_size] = tables
+    return tables
+
+
+_EDGE_TABLES = {}
+
+def _get_edge_tables(arena_size):
+    """Builds (once per arena size) the edges and a table of which edge each tile is on
+
+    Returns:
+        A tuple (edges, edge_ids). edges is a tuple of the four edges, each a tuple of (x, y) locations,
+        in the order top right, top left, bottom left, bottom right. edge_ids[x * arena_size + y] is
+        the index of the edge a tile is on, or None.
+
+    """
+    tables = _EDGE_TABLES.get(arena_size)
+    if tables is not None:
+        return tables
+
+    half_arena = arena_size // 2
+    top_right = tuple((half_arena + num, arena_size - 1 - num) for num in range(half_arena))
+    top_left = tuple((half_arena - 1 - num, arena_size - 1 - num) for num in range(half_arena))
+    bottom_left = tuple((half_arena - 1 - num, num) for num in range(half_arena))
+    bottom_right = tuple((half_arena + num, num) for num in range(half_arena))
+    edges = (top_right, top_left, bottom_left, bottom_right)
+
+    edge_ids = [None] * (arena_size * arena_size)
+    for edge_id, edge in enumerate(edges):
+        for x, y in edge:
+            edge_ids[x * arena_size + y] = edge_id
+    tables = (edges, tuple(edge_ids))
+    _EDGE_TABLES[arena_size] = tables
+    return tables
+
+
+_STENCILS = {}
+
+def _get_stencil(radius, hit_radius):
+    """Builds (once per radius) the [x, y] offsets of the tiles in range of a unit at [0, 0]
+
+    A unit with a given range affects all locations who's centers are within that range + get hit radius.
+    The offsets are in the order get_locations_in_range has always returned locations.
+    """
+    key = (radius, hit_radius)
+    stencil = _STENCILS.get(key)
+    if stencil is None:
+        search_radius = math.ceil(radius)
+        stencil = tuple((dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) < radius + hit_radius)
+        _STENCILS[key] = stencil
+    return stencil
+
+
+_RANGE_CACHE = {}
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +110,12 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    Iterating over a game_map yields every in bounds location, row by row. Each loop gets its own
+    iterator, so loops can be nested. The yielded locations are (x, y) tuples rather than [x, y] lists.
+
+    Units are stored in a flat list indexed by ``x * ARENA_SIZE + y``, and whether a tile is
+    on the board is looked up in a table built once per arena size.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -35,45 +142,84 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
+        self.__in_bounds = _get_in_bounds_table(self.ARENA_SIZE)
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__locations = _get_location_tables(self.ARENA_SIZE)
+        self.__edges, self.__edge_ids = _get_edge_tables(self.ARENA_SIZE)
+        self.__hit_radius = None
+        self.__bitboard = None
     
     def __getitem__(self, location):
-        if len(location) == 2 and self.in_arena_bounds(location):
-            x,y = location
-            return self.__map[x][y]
+        if len(location) == 2:
+            x, y = location
+            size = self.ARENA_SIZE
+            if type(x) is int and type(y) is int:
+                if 0 <= x < size and 0 <= y < size and self.__in_bounds[x * size + y]:
+                    return self.__map[x * size + y]
+            elif self.in_arena_bounds(location):
+                return self.__map[x * size + y]
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__map[x * self.ARENA_SIZE + y] = val
+            self.__update_bitboard(x, y)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        return iter(self.__locations[0])
+
+    def iter_locations(self, player_index=None):
+        """Iterates over the in bounds locations of the board or of one player's half of it
+
+        Args:
+            player_index: 0 for your half of the board, 1 for your opponent's half, None for the whole board
+
+        Returns:
+            A new iterator over the locations, row by row. Locations are (x, y) tuples, use list() for an [x, y] list
+
+        """
+        if player_index is None:
+            return iter(self.__locations[0])
+        if player_index < 0 or player_index > 1:
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+            return iter(())
+        return iter(self.__locations[1 + player_index])
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[] for _ in range(self.ARENA_SIZE * self.ARENA_SIZE)]
+
+    def __update_bitboard(self, x, y):
+        # Off board tiles have no bit, a negative index would not even be a valid shift
+        if self.__bitboard is not None and self.in_arena_bounds([x, y]):
+            self.__bitboard.set_tile(x, y, self.__map[x * self.ARENA_SIZE + y])
+
+    def get_bitboard(self):
+        """Gets the BitBoard mirroring this map
+
+        The bitboard is built on first use and then kept up to date by add_unit, remove_unit, 
+        upgrade_unit and item assignment. Editing the unit lists returned by game_map[x, y] directly is not tracked.
+
+        Returns:
+            A BitBoard with masks of the in bounds tiles, structures and unit types on this map
+
+        """
+        if self.__bitboard is None:
+            self.__bitboard = BitBoard(self)
+        return self.__bitboard
+
+    def structure_fingerprint(self):
+        """Gets a key identifying which tiles currently hold a structure
+
+        Placing and then removing the same structure restores the previous fingerprint. 
+
+        Returns:
+            An integer that changes whenever the structure layout changes
+
+        """
+        return self.get_bitboard().structures
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -89,22 +235,13 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        size = self.ARENA_SIZE
+        if type(x) is int and type(y) is int:
+            return 0 <= x < size and 0 <= y < size and self.__in_bounds[x * size + y]
+        return _compute_in_arena_bounds(x, y, size)
 
     def get_edge_locations(self, quadrant_description):
-        """Takes in an edge description and returns a list of locations.
+        """Takes in an edge description and returns the locations along that edge.
         
         Args:
             quadrant_description: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
@@ -117,8 +254,7 @@ class GameMap:
             self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in self.__edges[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -127,27 +263,35 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in self.__edges]
+
+    def _edge_tiles(self, edge):
+        """The (x, y) locations of an edge, shared by every map of this size, for pathfinding that only reads them
+
+        """
+        return self.__edges[edge]
+
+    def get_edge_id(self, location):
+        """Gets the edge a location is on
+
+        Args:
+            location: A map location
+
+        Returns:
+            The edge constant (game_map.TOP_RIGHT, game_map.BOTTOM_LEFT, etc.) of the edge the location is on, 
+            or None if it is not on an edge
+
+        """
+        x, y = location
+        size = self.ARENA_SIZE
+        if type(x) is int and type(y) is int:
+            if 0 <= x < size and 0 <= y < size:
+                return self.__edge_ids[x * size + y]
+            return None
+        for edge_id, edge in enumerate(self.__edges):
+            if (x, y) in edge:
+                return edge_id
+        return None
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -163,15 +307,17 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         if player_index < 0 or player_index > 1:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__map[x * self.ARENA_SIZE + y].append(new_unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__map[x * self.ARENA_SIZE + y] = [new_unit]
+        self.__update_bitboard(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -184,9 +330,84 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         
         x, y = location
-        self.__map[x][y] = []
+        self.__map[x * self.ARENA_SIZE + y] = []
+        self.__update_bitboard(x, y)
+
+    def upgrade_unit(self, location):
+        """Upgrades the structure at the given location.
+
+        Args:
+            location: The location of the structure to upgrade
+
+        This function does not affect your turn and only changes the data stored in GameMap, see add_unit. 
+        Use it instead of calling upgrade() on a unit directly so the unit index stays up to date.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        x, y = location
+        for unit in self.__map[x * self.ARENA_SIZE + y]:
+            if unit.stationary and not unit.upgraded:
+                unit.upgrade()
+        self.__update_bitboard(x, y)
+
+    def __units_mask(self, player_index, unit_types, upgraded):
+        if isinstance(unit_types, str):
+            unit_types = [unit_types]
+        mask = 0
+        for (unit_player_index, unit_type, unit_upgraded), tiles in self.get_bitboard().units.items():
+            if ((player_index is None or unit_player_index == player_index) and
+                    (unit_types is None or unit_type in unit_types) and
+                    (upgraded is None or unit_upgraded == upgraded)):
+                mask |= tiles
+        return mask
+
+    def get_unit_locations(self, player_index=None, unit_types=None, upgraded=None):
+        """Gets the locations holding a unit that matches every given filter
+
+        Uses the unit index kept with the map's bitboard, so only the matching tiles are visited. 
+        For example, get_unit_locations(1, TURRET, True) gets the locations of every enemy upgraded turret.
+
+        Args:
+            player_index: 0 for your units, 1 for your opponent's, None for both
+            unit_types: A unit type or a list of unit types, None for every type
+            upgraded: True for upgraded units only, False for units that are not upgraded, None for both
+
+        Returns:
+            A list of locations, ordered by x then y
+
+        """
+        return self.get_bitboard().locations(self.__units_mask(player_index, unit_types, upgraded))
+
+    def get_units(self, player_index=None, unit_types=None, upgraded=None):
+        """Gets the units that match every given filter
+
+        Args:
+            player_index: 0 for your units, 1 for your opponent's, None for both
+            unit_types: A unit type or a list of unit types, None for every type
+            upgraded: True for upgraded units only, False for units that are not upgraded, None for both
+
+        Returns:
+            A list of GameUnits, ordered by their location's x then y
+
+        """
+        if isinstance(unit_types, str):
+            unit_types = [unit_types]
+        units = []
+        mask = self.__units_mask(player_index, unit_types, upgraded)
+        while mask:
+            low_bit = mask & -mask
+            mask ^= low_bit
+            for unit in self.__map[low_bit.bit_length() - 1]:
+                if ((player_index is None or unit.player_index == player_index) and
+                        (unit_types is None or unit.unit_type in unit_types) and
+                        (upgraded is None or unit.upgraded == upgraded)):
+                    units.append(unit)
+        return units
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -198,6 +419,8 @@ class GameMap:
         Returns:
             The locations that are within our search area
 
+        The offsets in range of each radius are computed once, so the search is a translation of them 
+        plus a bounds lookup. Results for locations on the board are cached across turns.
         """
         if radius < 0 or radius > self.ARENA_SIZE:
             self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
@@ -205,14 +428,28 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if self.__hit_radius is None:
+            self.__hit_radius = self.config["unitInformation"][0]['getHitRadius']
+        size = self.ARENA_SIZE
+        if type(x) is int and type(y) is int:
+            #Translate the stencil for this radius and keep the in bounds tiles, remembering the result for tiles on the board
+            key = (size, radius, self.__hit_radius, x, y)
+            in_range = _RANGE_CACHE.get(key)
+            if in_range is None:
+                in_bounds = self.__in_bounds
+                in_range = tuple((x + dx, y + dy) for dx, dy in _get_stencil(radius, self.__hit_radius)
+                                 if 0 <= x + dx < size and 0 <= y + dy < size and in_bounds[(x + dx) * size + y + dy])
+                if 0 <= x < size and 0 <= y < size and in_bounds[x * size + y]:
+                    _RANGE_CACHE[key] = in_range
+            return [[i, j] for i, j in in_range]
+
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
                 # A unit with a given range affects all locations who's centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
+                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + self.__hit_radius:
                     locations.append(new_location)
         return locations
 
@@ -1,7 +1,19 @@
 import unittest
+import io
 import json
+import os
+import tempfile
+import threading
+import time
+from .algocore import AlgoCore, get_message_type, decode_events, get_event_types
+from .budget import TurnBudget
+from .debug_log import DebugLog, DEBUG, INFO, PRODUCTION, log
 from .game_state import GameState
+from .profiling import Profiler
+from .reader import MessageReader
+from .simulator import ActionSimulator
 from .unit import GameUnit
+from .wavefront import HAS_NUMPY
 
 class BasicTests(unittest.TestCase):
 
@@ -224,7 +236,37 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(5, game.game_map.distance_between_locations([0, 0], [4, 3]), "The distance between 0,0 and 16,9 should be 5")
         self.assertEqual(0, len(game.game_map.get_locations_in_range([-500,-500], 10)), "Invalid tiles are being marked as in range")
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "A location should be in range of itself")
+
+        #Edges
+        game_map = game.game_map
+        self.assertEqual(game_map.BOTTOM_LEFT, game_map.get_edge_id([0, 13]), "[0, 13] is on the bottom left edge")
+        self.assertEqual(game_map.TOP_RIGHT, game_map.get_edge_id([14, 27]), "[14, 27] is on the top right edge")
+        self.assertIsNone(game_map.get_edge_id([13, 13]), "[13, 13] is not on an edge")
+        edge = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + [[14, 0]]
+        edge[0][0] += 1
+        self.assertEqual([13, 0], game_map.get_edges()[game_map.BOTTOM_LEFT][0], "Changing returned edges should not change the map's edges")
+        self.assertEqual(game_map.BOTTOM_LEFT, game_map.get_edge_id([13, 0]), "Changing returned edges should not change the map's edges")
+        self.assertEqual(game_map.BOTTOM_LEFT, game_map.get_edge_id([13.0, 0.0]), "Edge lookup should accept float coordinates")
+        for edge_id, edge in enumerate(game_map.get_edges()):
+            self.assertTrue(all(game_map.get_edge_id(location) == edge_id for location in edge), "Edge lookup disagrees with get_edges")
+
+        #Arena bounds
+        self.assertEqual(420, sum(1 for x in range(28) for y in range(28) if game.game_map.in_arena_bounds([x, y])), "The arena should have 420 tiles")
+        self.assertFalse(game.game_map.in_arena_bounds([-1, 13]), "Negative coordinates are out of bounds")
+        self.assertFalse(game.game_map.in_arena_bounds([28, 13]), "Coordinates past the arena are out of bounds")
+        self.assertTrue(game.game_map.in_arena_bounds([13.0, 0]), "Float coordinates should still be checked")
+        self.assertIsNone(game.game_map[-1, 13], "Out of bounds tiles should not wrap around")
     
+    def test_iteration(self):
+        game = self.make_turn_0_map()
+        locations = list(game.game_map)
+        self.assertEqual(420, len(locations), "Iteration should visit every in bounds tile")
+        self.assertEqual([(13, 0), (14, 0), (12, 1)], locations[:3], "Iteration should go row by row")
+        self.assertIsInstance(locations[0], tuple, "Yielded locations should not be shared lists")
+        self.assertEqual(420 * 420, sum(1 for _ in game.game_map for _ in game.game_map), "Nested loops should not share a cursor")
+        self.assertEqual(locations[:210], list(game.game_map.iter_locations(0)), "Player 0 owns the bottom half")
+        self.assertEqual(locations[210:], list(game.game_map.iter_locations(1)), "Player 1 owns the top half")
+
     def test_get_units(self):
         game = self.make_turn_0_map()
         self.assertEqual(0, len(game.game_map[13,13]), "There should not be a unit on this location")
@@ -234,11 +276,18 @@ class BasicTests(unittest.TestCase):
         for _ in range(3):
             game.game_map.add_unit("FF", [13,13])
         self.assertEqual(1, len(game.game_map[13,13]), "Towers seem to be stacking")
+        game.game_map.add_unit("FF", [13, 28])
+        game.game_map.remove_unit([-1, 13])
+        self.assertEqual([], game.game_map[14, 0], "Out of bounds locations should not wrap onto another tile")
+        self.assertEqual(1, len(game.game_map.get_units()), "Out of bounds locations should not change the map")
         
     def test_get_units_in_range(self):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
+        self.assertEqual(9, len(game.game_map.get_locations_in_range([0,13], 2.5)), "Tiles off the board should not be in range")
+        game.game_map.get_locations_in_range([13,13], 3.5)[0][0] = 100
+        self.assertEqual([10, 12], game.game_map.get_locations_in_range([13,13], 3.5)[0], "Cached ranges should not be changed by callers")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
@@ -256,6 +305,385 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_pathing(self):
+        game = self.make_turn_0_map()
+        open_path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], open_path[0], "Paths should start at the start location")
+        self.assertIn(open_path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "An open board should path to the target edge")
+        self.assertEqual(29, len(open_path), "An open board should take the shortest path")
+
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13])
+        self.assertEqual([26, 12], game.find_path_to_edge([13, 0])[-1], "A walled off unit should path to its best self destruct location")
+
+        for x in range(27):
+            game.game_map.remove_unit([x, 13])
+        self.assertEqual(open_path, game.find_path_to_edge([13, 0]), "Pathing state leaked between queries")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        first = game.find_path_to_edge([13, 0])
+        self.assertEqual(first, game.find_path_to_edge([13, 0]), "Cached path differs from computed path")
+        self.assertEqual((1, 1), (game.path_cache_hits, game.path_cache_misses), "Second query should hit the cache")
+
+        first.append([0, 0])
+        self.assertNotEqual(first, game.find_path_to_edge([13, 0]), "Callers should not be able to edit cached paths")
+
+        game.game_map.add_unit("FF", [14, 1])
+        blocked = game.find_path_to_edge([13, 0])
+        self.assertNotIn([14, 1], blocked, "Path cache was not invalidated by add_unit")
+        self.assertEqual(2, game.path_cache_misses, "A new structure layout should miss the cache")
+
+        game.game_map.remove_unit([14, 1])
+        game.find_path_to_edge([13, 0])
+        self.assertEqual(2, game.path_cache_misses, "Restoring the layout should reuse its cached paths")
+
+    def test_batch_pathing(self):
+        game = self.make_turn_0_map()
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13])
+        game.game_map.add_unit("FF", [5, 8])
+        starts = [[13, 0], [5, 8], [20, 6], [0, 13], [13, 20]]
+        batch = game.find_paths_to_edge(starts)
+
+        single = self.make_turn_0_map()
+        for x in range(27):
+            single.game_map.add_unit("FF", [x, 13])
+        single.game_map.add_unit("FF", [5, 8])
+        self.assertEqual([single.find_path_to_edge(start) for start in starts], batch, "Batched paths differ from single paths")
+        self.assertIsNone(batch[1], "Blocked starts should have no path")
+
+    def test_next_hops(self):
+        game = self.make_turn_0_map()
+        for x in range(3, 27):
+            game.game_map.add_unit("FF", [x, 10])
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        pathfinder = game._shortest_path_finder
+        first = pathfinder.navigate_multiple_starts([[13, 0]], end_points, game)[0]
+        self.assertEqual(len(first) - 1, sum(1 for hop in pathfinder.next_hops if hop >= 0), "Every step of the path should be stored")
+
+        paths = pathfinder.navigate_multiple_starts([[13, 0], [14, 0], [13, 0]], end_points, game)
+        self.assertEqual(paths[0], paths[2], "Repeated starts should get the same path")
+        expected = [pathfinder.navigate_multiple_endpoints(start, end_points, game) for start in [[13, 0], [14, 0]]]
+        self.assertEqual(expected, paths[:2], "Table paths differ from searched paths")
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_wavefront(self):
+        from .wavefront import WavefrontPathFinder
+        game = self.make_turn_0_map()
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13])
+        game.game_map.add_unit("FF", [12, 10])
+        starts = [[13, 0], [5, 8], [20, 6], [27, 13]]
+        expected = game.find_paths_to_edge(starts)
+        game.set_path_finder(WavefrontPathFinder())
+        game.clear_path_cache()
+        self.assertEqual(expected, game.find_paths_to_edge(starts), "Wavefront paths differ from queue based paths")
+
+        bitboard = game.game_map.get_bitboard()
+        layouts = [bitboard.structures, bitboard.structures & ~bitboard.bit([26, 13]), bitboard.structures | bitboard.bit([13, 0])]
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)
+        paths = game._shortest_path_finder.navigate_layouts([13, 0], end_points, game, layouts)
+        self.assertEqual(expected[0], paths[0], "The current layout should give the current path")
+        self.assertEqual(game.find_path_with_overrides([13, 0], remove=[[26, 13]]), paths[1], "Batched layouts differ from overridden paths")
+        self.assertIsNone(paths[2], "Blocked starts should have no path")
+
+    def test_path_overrides(self):
+        game = self.make_turn_0_map()
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13])
+        game.game_map.add_unit("FF", [12, 10])
+        add = [[13, 2], [14, 3], [12, 9]]
+        remove = [[12, 10], [26, 13]]
+        overridden = [game.find_path_with_overrides(start, add=add, remove=remove) for start in [[13, 0], [5, 8], [20, 6]]]
+        self.assertEqual(1, len(game.game_map[12, 10]), "Overrides should not change the map")
+        self.assertEqual([], game.game_map[13, 2], "Overrides should not change the map")
+
+        for location in add:
+            game.game_map.add_unit("FF", location)
+        for location in remove:
+            game.game_map.remove_unit(location)
+        game.clear_path_cache()
+        expected = [game.find_path_to_edge(start) for start in [[13, 0], [5, 8], [20, 6]]]
+        self.assertEqual(expected, overridden, "Overridden paths differ from paths on the changed map")
+        self.assertEqual(expected[0], game.find_path_with_overrides([13, 0], add=[[14, 1]], remove=[[14, 1]]),
+                         "Locations both added and removed should be empty")
+        self.assertIsNone(game.find_path_with_overrides([5, 9], add=[[5, 9]]), "Added structures should block the start")
+
+    def test_bitboard(self):
+        game = self.make_turn_0_map()
+        bitboard = game.game_map.get_bitboard()
+        self.assertEqual(420, bitboard.count(bitboard.in_bounds), "The arena should have 420 tiles")
+
+        game.game_map.add_unit("FF", [13, 13], 0)
+        game.game_map.add_unit("DF", [14, 14], 1)
+        game.game_map.add_unit("EI", [10, 10], 0)
+        self.assertEqual([[13, 13]], bitboard.locations(bitboard.friendly_structures), "Friendly structure mask is wrong")
+        self.assertEqual([[14, 14]], bitboard.locations(bitboard.enemy_structures), "Enemy structure mask is wrong")
+        self.assertEqual([[10, 10]], bitboard.locations(bitboard.unit_types["EI"]), "Mobile units should be tracked by type")
+
+        game.game_map.remove_unit([13, 13])
+        self.assertEqual(0, bitboard.friendly_structures, "Removed structures should leave the mask")
+        game.game_map.add_unit("FF", [-1, 14], 0)
+        game.game_map.add_unit("FF", [13, 28], 1)
+        game.game_map.remove_unit([0, -1])
+        self.assertEqual((0, [[14, 14]]), (bitboard.friendly_structures, bitboard.locations(bitboard.enemy_structures)),
+                         "Out of bounds locations should only be warned about")
+
+        self.assertTrue(game.can_reach_edge([13, 0]), "An open board should reach the edge")
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13])
+        self.assertFalse(game.can_reach_edge([13, 0]), "A walled off unit should not reach the edge")
+        self.assertTrue(game.can_reach_edge([27, 13]), "A unit past the wall should reach the edge")
+
+    def test_unit_index(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("DF", [3, 12], 0)
+        game_map.add_unit("DF", [13, 20], 1)
+        game_map.add_unit("DF", [20, 15], 1)
+        game_map.add_unit("FF", [14, 16], 1)
+        game_map.upgrade_unit([20, 15])
+        self.assertEqual([[13, 20], [14, 16], [20, 15]], game_map.get_unit_locations(1), "Wrong enemy unit locations")
+        self.assertEqual([[20, 15]], game_map.get_unit_locations(1, "DF", True), "Wrong enemy upgraded turret locations")
+        self.assertEqual([[3, 12], [13, 20]], game_map.get_unit_locations(unit_types=["DF"], upgraded=False), "Wrong turret locations")
+        self.assertEqual(["FF"], [unit.unit_type for unit in game_map.get_units(1, "FF")], "Wrong enemy walls")
+
+        game_map.remove_unit([13, 20])
+        game_map.add_unit("FF", [3, 12], 0)
+        self.assertEqual([[14, 16]], game_map.get_unit_locations(unit_types="FF", player_index=1), "Replaced units should leave the index")
+        self.assertEqual([[20, 15]], game_map.get_unit_locations(unit_types="DF"), "Removed units should leave the index")
+        self.assertEqual(1, len(game.get_attackers([19, 13], 0)), "Only the turret at [20, 15] reaches [19, 13]")
+
+    def test_unit_stats(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [3, 12], 0)
+        game.game_map.add_unit("DF", [4, 12], 0)
+        first, second = game.game_map[3, 12][0], game.game_map[4, 12][0]
+        self.assertIs(first._stats, second._stats, "Units of one type should share their stats")
+        self.assertFalse(hasattr(first, "__dict__"), "Units should not carry an instance dict")
+        self.assertEqual((2.5, 5.0, 90.0, [2.0, 0]), (first.attackRange, first.damage_i, first.health, first.cost), "Wrong turret stats")
+
+        game.game_map.upgrade_unit([3, 12])
+        self.assertTrue(first.upgraded, "Upgraded units should be marked upgraded")
+        self.assertEqual((3.5, 15.0, [6.0, 0]), (first.attackRange, first.damage_i, first.cost), "Wrong upgraded turret stats")
+        self.assertEqual(2.5, second.attackRange, "Upgrading a unit should not change other units")
+
+    def test_parse_state(self):
+        config = self.make_turn_0_map().config
+        turn = """{"p2Units":[[],[],[[24,14,75,"6"]],[],[],[],[],[]],"turnInfo":[0,3,-1],"p1Stats":[30.0,25.0,5.0,0],"p2Stats":[28.0,12.0,7.5,0],"events":{},
+            "p1Units":[[[0,13,60.0,"1"]],[],[[3,12,75,"2"]],[[13,0,15,"3"],[13,0,15,"4"]],[],[],[[0,13,0,"5"]],[[3,12,0,"6"]]]}"""
+        from_string = GameState(config, turn)
+        from_dict = GameState(config, json.loads(turn))
+        for game in (from_string, from_dict):
+            self.assertEqual(3, game.turn_number, "Wrong turn number")
+            self.assertEqual([12.0, 7.5], game.get_resources(1), "Wrong enemy resources")
+            self.assertTrue(game.game_map[0, 13][0].pending_removal, "Removal was not parsed")
+            self.assertTrue(game.game_map[3, 12][0].upgraded, "Upgrade was not parsed")
+            self.assertEqual(2, len(game.game_map[13, 0]), "Wrong number of stacked units")
+            self.assertEqual(75.0, game.game_map[24, 14][0].health, "Wrong unit health")
+            self.assertIsInstance(game.game_map[24, 14][0].health, float, "Health should be parsed as a float")
+        self.assertEqual([str(from_string.game_map[location]) for location in from_string.game_map],
+            [str(from_dict.game_map[location]) for location in from_dict.game_map], "Parsing a dict should match parsing a string")
+
+    def test_action_frames(self):
+        frame = """{"p2Units":[[],[],[],[],[],[],[],[]],"turnInfo":[1,4,17,2],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],
+            "events":{"selfDestruct":[],"breach":[[[13,27],1.0,3,"12",1]],"damage":[],"shield":[],"move":[],"spawn":[],"death":[[[5,10],0,"7",2,false]],"attack":[],"melee":[]}}"""
+        self.assertEqual(1, get_message_type(frame), "Wrong message type")
+        self.assertEqual(0, get_message_type('{"turnInfo": [0, 1, -1]}'), "Whitespace should not break the message type")
+        self.assertIsNone(get_message_type('{"p1Stats":[]}'), "Messages without turnInfo have no type")
+        self.assertEqual({"breach": [[[13, 27], 1.0, 3, "12", 1]], "damage": []}, decode_events(frame, ["breach", "damage"]), "Wrong decoded events")
+        self.assertEqual(["breach", "death"], get_event_types(frame), "Wrong event types")
+
+        algo = AlgoCore()
+        self.assertEqual(json.loads(frame), algo.decode_action_frame(frame), "Without subscriptions frames are fully decoded")
+        algo.action_frame_events = ["death"]
+        self.assertEqual({"turnInfo": [1, 4, 17, 2], "events": {"death": [[[5, 10], 0, "7", 2, False]]}}, algo.decode_action_frame(frame), "Only subscribed events should be decoded")
+        algo.action_frame_events = ["damage", "spawn"]
+        self.assertIsNone(algo.decode_action_frame(frame), "Frames without subscribed events should be skipped")
+
+    def test_message_reader(self):
+        frame = """{"turnInfo":[1,0,%d],"events":{"breach":%s,"death":%s,"move":%s}}\n"""
+        messages = ['{"turnInfo":[0,0,-1]}\n', frame % (1, "[]", '[[[5,10],0,"7",2,false]]', "[]"), frame % (2, '[[[13,27],1.0,3,"12",1]]', "[]", "[]"),
+                    frame % (3, "[]", "[]", '[[[5,11],[5,10],[5,10],3,"8",1]]'), '{"turnInfo":[0,1,-1]}\n']
+        algo = AlgoCore()
+        algo.action_frame_events = ["breach"]
+        reader = MessageReader(algo.decode_action_frame, io.StringIO("".join(messages))).start()
+
+        self.assertEqual((messages[0], None), reader.get(timeout=5), "Turns should be queued in order")
+        message, decoded = reader.get(timeout=5)
+        self.assertEqual(messages[2], message, "Only frames with subscribed events should be queued")
+        self.assertEqual([1, 0, 2], decoded["turnInfo"], "Queued frames should be decoded")
+        self.assertEqual(messages[4], reader.get(timeout=5)[0], "Skipped frames should not delay the next turn")
+        self.assertEqual((None, None), reader.get(timeout=5), "The end of the input should be reported")
+        skipped_frames, latest_frame, latest_frames = reader.skipped()
+        self.assertEqual(2, skipped_frames, "Wrong number of skipped frames")
+        self.assertEqual(messages[3], latest_frame, "The newest skipped frame should be kept")
+        self.assertEqual({"death": messages[1], "move": messages[3]}, latest_frames, "The newest skipped frame of each event type should be kept")
+        self.assertFalse(reader.turn_arrived.is_set(), "No turn should be waiting once all were taken")
+
+    def test_speculative_jobs(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        algo = AlgoCore()
+        algo.add_speculative_job("attackers", lambda state, cancelled: len(state.get_attackers([13, 14], 1)))
+        algo.add_speculative_job("broken", lambda state, cancelled: {}["threat"])
+        algo.add_speculative_job("stalled", lambda state, cancelled: cancelled.wait(5))
+        algo.speculate(game)
+        records = len(log.records)
+        algo.speculative_jobs.start(game)
+        algo.speculative_jobs.wait(0.2)
+        self.assertTrue(algo.speculative_jobs.running(), "Jobs should run until cancelled")
+        algo.speculative_jobs.cancel()
+        self.assertTrue(log.records[records].startswith("ERROR: Speculative job broken failed"), "Failed jobs should be logged as errors")
+        self.assertIn("KeyError: 'threat'", log.records[records], "Failed jobs should be logged with their exception")
+        del log.records[records:]
+
+        self.assertEqual(1, algo.speculative_result("attackers", game), "Finished results should be kept after a cancel")
+        self.assertIsNone(algo.speculative_result("stalled", game), "Results finished after a cancel should be dropped")
+        changed = self.make_turn_0_map()
+        changed.game_map.add_unit("DF", [13, 12], 0)
+        changed.game_map.add_unit("FF", [0, 13], 0)
+        self.assertEqual("none", algo.speculative_result("attackers", changed, "none"), "Results should not be reused on a different board")
+        self.assertEqual((1, 2), (algo.speculative_jobs.hits, algo.speculative_jobs.misses), "Wrong hit and miss counts")
+        self.assertFalse(algo.speculative_jobs.running(), "Jobs checking cancelled should have returned by the end of a cancel")
+
+        started = threading.Event()
+        algo = AlgoCore()
+        algo.add_speculative_job("stalled", lambda state, cancelled: started.set() or time.sleep(0.3))
+        algo.speculative_jobs.start(game)
+        started.wait(5)
+        records = len(log.records)
+        algo.speculative_jobs.cancel()
+        self.assertTrue(algo.speculative_jobs.running(), "Jobs ignoring cancelled should be reported until they return")
+        self.assertIn("still running", log.records[-1], "Jobs ignoring cancelled should be warned about")
+        del log.records[records:]
+        algo.speculative_jobs.wait(5)
+        self.assertFalse(algo.speculative_jobs.running(), "Jobs should not be reported once they return")
+
+    def test_turn_budget(self):
+        now = [0.0]
+        def analysis(cost):
+            now[0] += cost
+            return "full"
+
+        budget = TurnBudget(2.0, 0.5, clock=lambda: now[0])
+        budget.add_fallback("threat map", lambda cost: "fallback")
+        budget.start()
+        self.assertEqual("full", budget.run("threat map", analysis, 1.0), "The analysis should run while there is time")
+        self.assertAlmostEqual(1.0, budget.remaining(), msg="Wrong time remaining")
+        self.assertEqual("fallback", budget.run("threat map", analysis, 1.0), "The fallback should run when the analysis would not fit")
+        self.assertEqual("full", budget.run("paths", analysis, 1.0), "Analyses without a fallback should always run")
+        self.assertTrue(budget.is_low(), "The budget should be low once it ran over")
+        self.assertEqual(["threat map"], budget.fired, "Wrong fallbacks fired")
+
+        budget.start()
+        self.assertEqual(([], 2.0), (budget.fired, budget.remaining()), "Starting a turn should reset the clock")
+        self.assertEqual({"threat map": 1}, budget.fired_counts, "Fallback counts should be kept between turns")
+        self.assertEqual(4.0, TurnBudget.from_config(self.make_turn_0_map().config).seconds, "Wrong budget from the config")
+        # The fallbacks were logged to the shared log, keep them out of the test output
+        log.records = []
+
+    def test_debug_log(self):
+        calls = []
+        def expensive():
+            calls.append(1)
+            return [[13, 0], [13, 1]]
+
+        stream = io.StringIO()
+        log = DebugLog(INFO, stream)
+        log.debug("Path = {}", expensive)
+        log.info("Turn {} of {}", 3, "Prototypo")
+        self.assertEqual([], calls, "Callable arguments of dropped records should not be called")
+        self.assertEqual("", stream.getvalue(), "Records should be buffered until flushed")
+
+        log.set_level(DEBUG)
+        log.debug("Path = {}", expensive)
+        log.flush()
+        self.assertEqual("INFO: Turn 3 of Prototypo\nDEBUG: Path = [[13, 0], [13, 1]]\n", stream.getvalue(), "Wrong flushed records")
+        self.assertEqual([], log.records, "Flushing should empty the buffer")
+
+        log.set_level(PRODUCTION)
+        log.info("Turn {}", expensive)
+        self.assertFalse(log.is_enabled(INFO), "Info should be off in production")
+        self.assertEqual(([], 1), (log.records, len(calls)), "Production should skip formatting")
+
+    def test_profiler(self):
+        profiler = Profiler()
+        @profiler.profiled("threat map")
+        def threat_map():
+            with profiler.span("pathfinding"):
+                pass
+
+        threat_map()
+        self.assertEqual({}, profiler.spans, "Spans should not be recorded while profiling is off")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "algo.profile.jsonl")
+            profiler.enable(path, slowest_turns=1)
+            for turn in range(3):
+                profiler.start_turn(turn)
+                for _ in range(turn):
+                    threat_map()
+                profiler.end_turn()
+            written = profiler.close()
+            with open(path) as summaries:
+                turns = [json.loads(line) for line in summaries]
+
+            self.assertEqual([0, 1, 2], [summary["turn"] for summary in turns], "Every turn should be summarized")
+            self.assertEqual({}, turns[0]["spans"], "Turns without spans should have an empty summary")
+            self.assertEqual(2, turns[2]["spans"]["pathfinding"]["calls"], "Wrong span call count")
+            self.assertEqual([3, 3], [profiler.totals["threat map"][0], profiler.totals["pathfinding"][0]], "Wrong total call counts")
+            self.assertEqual(1, len(written), "Stats should be kept for the slowest turn only")
+            self.assertTrue(os.path.exists(written[0]), "The cProfile stats should be written")
+
+    def test_simulator(self):
+        game = self.make_turn_0_map()
+        result = ActionSimulator(game).run([("PI", [13, 0], 3)])
+        self.assertEqual(3, len(result.breaches), "Units on an open board should all breach")
+        self.assertEqual([0, 3], result.health_lost, "Each breach should cost the enemy a health")
+        self.assertEqual(29, result.frames, "Scouts should move every frame and breach from the end of their path")
+        recorded = ActionSimulator(game).run([("PI", [13, 0], 1)], [("PI", [14, 27], 1)], record_frames=True)
+        self.assertEqual({0: (13, 1, 15.0), 1: (14, 26, 15.0)}, recorded.frame_units[0], "Units should be recorded by spawn index")
+        self.assertEqual({}, recorded.frame_units[-1], "Breached units should not be recorded")
+        self.assertEqual([], result.frame_units, "Frames should only be recorded on request")
+
+        for location in ([26, 14], [25, 14], [24, 14]):
+            game.game_map.add_unit("DF", location, 1)
+        simulator = ActionSimulator(game)
+        scouts = simulator.run([("PI", [13, 0], 3)])
+        self.assertEqual(0, len(scouts.breaches), "Turrets should stop a few scouts")
+        self.assertEqual(repr(scouts), repr(simulator.run([("PI", [13, 0], 3)])), "Runs should not change the snapshot")
+        demolishers = simulator.run([("EI", [13, 0], 3)])
+        self.assertEqual([[24, 14], [25, 14]], [location for location, _, _ in demolishers.destroyed], "Demolishers should outrange the turrets")
+        self.assertEqual(3, len(game.game_map.get_units(1)), "Simulating should not change the game state")
+
+        game = self.make_turn_0_map()
+        for x in range(27):
+            game.game_map.add_unit("FF", [x, 13], 1)
+        blocked = ActionSimulator(game).run([("PI", [13, 0], 3)])
+        self.assertEqual([[[26, 12], "PI", 0]] * 3, blocked.self_destructs, "Walled off units should self destruct at the end of their path")
+        self.assertGreaterEqual(blocked.structure_damage[0], 90, "Self destructs should damage the walls next to them")
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_batch_simulator(self):
+        from .batch_simulator import BatchSimulator
+        game = self.make_turn_0_map()
+        for location in ([26, 14], [25, 14], [24, 14], [3, 14]):
+            game.game_map.add_unit("DF", location, 1)
+        for x in range(10, 17):
+            game.game_map.add_unit("FF", [x, 15], 1)
+        game.game_map.add_unit("PI", [20, 6], 0)
+        plans = [[("PI", [13, 0], 3)], [("PI", [13, 0], 10)], [("EI", [13, 0], 3), ("PI", [5, 8], 2)], [("SI", [22, 8], 2)], [("PI", [25, 14], 1)], []]
+        results = BatchSimulator(game).run_many(plans)
+        simulator = ActionSimulator(game)
+        for index, plan in enumerate(plans):
+            expected = simulator.run(plan)
+            self.assertEqual([len(expected.breaches), expected.frames, len(expected.destroyed), len(expected.self_destructs)],
+                             [results.breaches[index], results.frames[index], results.destroyed[index], results.self_destructs[index]],
+                             "Batched plan {} differs from the simulator".format(index))
+            self.assertEqual([expected.damage_dealt[0], expected.damage_dealt[1]], [results.damage_dealt[index], results.damage_taken[index]],
+                             "Batched plan {} dealt different damage".format(index))
+
     def test_print_unit(self):
         game = self.make_turn_0_map()
 
@@ -0,0 +1,162 @@
+_GEOMETRY = {}
+
+def _get_geometry(arena_size, in_arena_bounds):
+    """Builds (once per arena size) the static masks used by every BitBoard
+
+    Returns:
+        A tuple (in_bounds, not_bottom_row, not_top_row, rows) where rows[y] is the mask of row y.
+
+    """
+    geometry = _GEOMETRY.get(arena_size)
+    if geometry is not None:
+        return geometry
+
+    in_bounds = 0
+    rows = [0] * arena_size
+    for x in range(arena_size):
+        for y in range(arena_size):
+            bit = 1 << (x * arena_size + y)
+            rows[y] |= bit
+            if in_arena_bounds([x, y]):
+                in_bounds |= bit
+    everything = (1 << (arena_size * arena_size)) - 1
+    geometry = (in_bounds, everything & ~rows[0], everything & ~rows[-1], tuple(rows))
+    _GEOMETRY[arena_size] = geometry
+    return geometry
+
+
+class BitBoard:
+    """Integer bitmask view of the units on a GameMap
+
+    Each tile is one bit, tile [x, y] is bit ``x * ARENA_SIZE + y``. Sets of tiles can then be
+    combined with ``&``, ``|`` and ``~`` and grown with bit shifts, which is far cheaper than
+    looping over locations. Use GameMap.get_bitboard() to get the bitboard of a map, it is kept
+    up to date as units are added and removed.
+
+    Attributes :
+        * ARENA_SIZE (int): The size of the arena
+        * in_bounds (int): The tiles inside the diamond shaped game board
+        * friendly_structures (int): The tiles holding one of your structures
+        * enemy_structures (int): The tiles holding one of your opponent's structures
+        * unit_types (dict): Maps a unit type to the tiles holding at least one unit of that type
+        * units (dict): Maps (player_index, unit_type, upgraded) to the tiles holding at least one such unit
+
+    """
+    def __init__(self, game_map):
+        """Builds the bitboard from the units currently on game_map
+
+        Args:
+            game_map: The GameMap to mirror
+
+        """
+        self.ARENA_SIZE = game_map.ARENA_SIZE
+        self.in_bounds, self._not_bottom_row, self._not_top_row, self.rows = _get_geometry(self.ARENA_SIZE, game_map.in_arena_bounds)
+        self.friendly_structures = 0
+        self.enemy_structures = 0
+        self.unit_types = {}
+        self.units = {}
+        for x in range(self.ARENA_SIZE):
+            for y in range(self.ARENA_SIZE):
+                if self.in_bounds >> (x * self.ARENA_SIZE + y) & 1:
+                    self.set_tile(x, y, game_map[x, y])
+
+    @property
+    def structures(self):
+        """The tiles holding a structure of either player"""
+        return self.friendly_structures | self.enemy_structures
+
+    def bit(self, location):
+        """Gets the single bit mask of a location
+
+        """
+        return 1 << (location[0] * self.ARENA_SIZE + location[1])
+
+    def mask(self, locations):
+        """Gets the mask of a list of locations
+
+        """
+        mask = 0
+        for x, y in locations:
+            mask |= 1 << (x * self.ARENA_SIZE + y)
+        return mask
+
+    def locations(self, mask):
+        """Gets the locations of the tiles in a mask, in increasing bit order
+
+        """
+        locations = []
+        while mask:
+            low_bit = mask & -mask
+            index = low_bit.bit_length() - 1
+            locations.append([index // self.ARENA_SIZE, index % self.ARENA_SIZE])
+            mask ^= low_bit
+        return locations
+
+    def count(self, mask):
+        """Counts the tiles in a mask
+
+        """
+        return bin(mask).count("1")
+
+    def set_tile(self, x, y, units):
+        """Updates every mask for a tile to match the units now on it
+
+        Args:
+            x, y: The tile that changed
+            units: The list of GameUnits now on the tile
+
+        """
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        self.friendly_structures &= ~bit
+        self.enemy_structures &= ~bit
+        for unit_type in self.unit_types:
+            self.unit_types[unit_type] &= ~bit
+        for key in self.units:
+            self.units[key] &= ~bit
+        for unit in units:
+            if unit.stationary:
+                if unit.player_index == 0:
+                    self.friendly_structures |= bit
+                else:
+                    self.enemy_structures |= bit
+            self.unit_types[unit.unit_type] = self.unit_types.get(unit.unit_type, 0) | bit
+            key = (unit.player_index, unit.unit_type, unit.upgraded)
+            self.units[key] = self.units.get(key, 0) | bit
+
+    def open_tiles(self):
+        """The in bounds tiles a mobile unit can move through
+
+        """
+        return self.in_bounds & ~(self.friendly_structures | self.enemy_structures)
+
+    def neighbors(self, mask):
+        """Gets the tiles orthogonally adjacent to any tile in mask, clipped to the board
+
+        """
+        size = self.ARENA_SIZE
+        return (((mask << 1) & self._not_bottom_row) | ((mask >> 1) & self._not_top_row) |
+                (mask << size) | (mask >> size)) & self.in_bounds
+
+    def flood(self, seeds, passable=None):
+        """Gets every tile connected to the seeds through passable tiles
+
+        Args:
+            seeds: A mask of the tiles to start from
+            passable: A mask of the tiles that can be crossed, open_tiles() if None
+
+        Returns:
+            The mask of reachable tiles, including the passable seeds
+
+        """
+        if passable is None:
+            passable = self.open_tiles()
+        size = self.ARENA_SIZE
+        not_bottom_row = self._not_bottom_row
+        not_top_row = self._not_top_row
+        reached = seeds & passable
+        while True:
+            grown = (reached | ((reached << 1) & not_bottom_row) | ((reached >> 1) & not_top_row) |
+                     (reached << size) | (reached >> size)) & passable
+            if grown == reached:
+                return reached
+            reached = grown
@@ -0,0 +1,110 @@
+"""
+Optional background reader for the messages the game engine sends on stdin.
+
+By default AlgoCore reads stdin on the main thread, so the action frames sent while on_turn is busy
+wait in the pipe and are handled one by one once it returns. With AlgoCore.threaded_input set, a
+MessageReader thread reads each line as soon as it arrives. Action frames the strategy does not
+subscribe to (see AlgoCore.action_frame_events) are never queued, so a turn message does not wait
+behind a backlog of frames. Only the newest skipped frame of each kind of event is kept instead.
+"""
+import queue
+import sys
+import threading
+import time
+
+from .algocore import get_message_type, get_event_types
+
+
+class MessageReader(object):
+    """Reads engine messages on a daemon thread into a bounded queue
+
+    Attributes :
+        * turn_arrived (threading.Event): Set while a turn or end of game message is waiting in the queue
+        * latest_frame (string): The newest action frame message that was skipped, None if there was none
+        * latest_frames (dict): The newest skipped action frame message with events of each type, by event type
+        * skipped_frames (int): The number of action frames that were skipped
+        * arrived (float): The time.perf_counter() time the message last returned by get() was read
+
+    """
+    def __init__(self, decode_frame, stream=None, maxsize=256):
+        """ Sets up the reader, call start() to start reading
+
+        Args:
+            * decode_frame: Called with each action frame message, returns the frame to queue or None to skip it, like AlgoCore.decode_action_frame
+            * stream: The stream to read messages from, sys.stdin by default
+            * maxsize: The most messages the queue holds. The reader waits for the algo when it is full
+
+        """
+        self._decode_frame = decode_frame
+        self._stream = stream if stream is not None else sys.stdin
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._waiting_turns = 0
+        self._thread = threading.Thread(target=self._run, name="MessageReader", daemon=True)
+        self.turn_arrived = threading.Event()
+        self.latest_frame = None
+        self.latest_frames = {}
+        self.skipped_frames = 0
+        self.arrived = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                line = self._stream.readline()
+            except (EOFError, ValueError):
+                line = ""
+            if line == "":
+                # End of input, get() returns None for the message
+                self._queue.put((None, None, None, time.perf_counter()))
+                return
+            arrived = time.perf_counter()
+            message_type = get_message_type(line)
+            frame = None
+            if message_type == 1:
+                frame = self._decode_frame(line)
+                if frame is None:
+                    event_types = get_event_types(line)
+                    with self._lock:
+                        self.latest_frame = line
+                        for event_type in event_types:
+                            self.latest_frames[event_type] = line
+                        self.skipped_frames += 1
+                    continue
+            elif message_type == 0 or message_type == 2:
+                with self._lock:
+                    self._waiting_turns += 1
+                    self.turn_arrived.set()
+            self._queue.put((message_type, line, frame, arrived))
+
+    def get(self, timeout=None):
+        """Takes the next message off the queue, waiting for one if it is empty
+
+        Args:
+            timeout: The most seconds to wait, forever if None. queue.Empty is raised if it runs out
+
+        Returns:
+            (message, frame), message being the line read and frame the result of decode_frame for
+            action frames, None otherwise. message is None once the input has ended.
+
+        """
+        message_type, message, frame, self.arrived = self._queue.get(timeout=timeout)
+        if message_type == 0 or message_type == 2:
+            with self._lock:
+                self._waiting_turns -= 1
+                if self._waiting_turns == 0:
+                    self.turn_arrived.clear()
+        return message, frame
+
+    def skipped(self):
+        """Gets the frames skipped so far, taken together while the reader thread is not updating them
+
+        Returns:
+            (skipped_frames, latest_frame, latest_frames), latest_frames being a copy
+
+        """
+        with self._lock:
+            return self.skipped_frames, self.latest_frame, dict(self.latest_frames)
@@ -16,14 +16,46 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The BitBoard class in bitboard.py mirrors a GameMap as integer bitmasks, one bit per tile. 
+Investigating it is useful for advanced players who want fast occupancy and connectivity checks. \n
+
+The WavefrontPathFinder class in wavefront.py is an optional NumPy backend for pathfinding that can search many boards at once. 
+Investigating it is useful for advanced players who want to score batches of candidate layouts. \n
+
+The MessageReader class in reader.py reads the engine's messages on a background thread when AlgoCore.threaded_input is set. 
+Investigating it is useful for advanced players whose turns are delayed by a backlog of action frames. \n
+
+The SpeculativeJobs class in speculation.py runs analysis registered with AlgoCore.add_speculative_job() while the action phase plays out. 
+Investigating it is useful for advanced players who want to spend less of their turn time on work that could be done ahead. \n
+
+The TurnBudget class in budget.py tracks the time left in a turn and swaps expensive analyses for cheaper fallbacks when it runs low. 
+Investigating it is useful for advanced players whose turns come close to the time limit. \n
+
+The DebugLog in debug_log.py buffers leveled debug records and writes them once per turn. gamelib.log is the log AlgoCore flushes. 
+Investigating it is useful for any player whose debug output slows their algo down. \n
+
+The Profiler in profiling.py records the wall time and call counts of named steps of each turn when AlgoCore.profile_turns is set. 
+Investigating it is useful for any player who wants to know where their turn time goes. \n
+
+The ActionSimulator class in simulator.py plays out an action phase frame by frame on a snapshot of a GameState. 
+Investigating it is useful for advanced players who want to score candidate attacks before committing to one. \n
+
+The BatchSimulator class in batch_simulator.py is an optional NumPy backend that plays out many candidate attacks against the same board in one call. 
+Investigating it is useful for advanced players who want to search over deploy locations, unit mixes and counts. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
+from .budget import TurnBudget
 from .util import debug_write
+from .debug_log import log
+from .profiling import profiler, profiled
+from .simulator import ActionSimulator
+from .batch_simulator import BatchSimulator
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "batch_simulator", "bitboard", "budget", "debug_log", "game_state", "game_map", "navigation", "profiling", "reader", "simulator", "speculation", "unit", "util", "wavefront"]
  
\ No newline at end of file
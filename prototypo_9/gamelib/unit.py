@@ -1,3 +1,6 @@
+from collections import namedtuple
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,9 +12,104 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+UnitStats = namedtuple("UnitStats", ["config", "unit_type", "upgraded", "stationary", "speed", "damage_f", "damage_i",
+                                     "attackRange", "shieldRange", "max_health", "shieldPerUnit", "cost"])
+UnitStats.__doc__ = """The static stats shared by every unit of one type and upgrade state. See GameUnit for the fields."""
+
+
+_UNIT_STATS = {}
+
+def get_unit_stats(unit_type, config, upgraded=False):
+    """Gets the stats record of a unit type, building it once per config
+
+    Args:
+        unit_type: The type of the unit
+        config: Contains information about the game
+        upgraded: Whether to get the stats of the upgraded unit
+
+    Returns:
+        A UnitStats record shared by every unit of that type and upgrade state
+
+    """
+    cached = _UNIT_STATS.get(id(config))
+    if cached is None or cached[0] is not config:
+        cached = (config, {})
+        _UNIT_STATS[id(config)] = cached
+    records = cached[1]
+    stats = records.get((unit_type, upgraded))
+    if stats is not None:
+        return stats
+
+    type_config = None
+    for unit_information in config["unitInformation"]:
+        if unit_information.get("shorthand") == unit_type:
+            type_config = unit_information
+            break
+    if type_config is None:
+        raise KeyError(unit_type)
+    if not upgraded:
+        stats = UnitStats(config, unit_type, False,
+            type_config["unitCategory"] == 0,
+            type_config.get("speed", 0),
+            type_config.get("attackDamageTower", 0),
+            type_config.get("attackDamageWalker", 0),
+            type_config.get("attackRange", 0),
+            type_config.get("shieldRange", 0),
+            type_config.get("startHealth", 0),
+            type_config.get("shieldPerUnit", 0),
+            (type_config.get("cost1", 0), type_config.get("cost2", 0)))
+    else:
+        base = get_unit_stats(unit_type, config)
+        upgrade = type_config.get("upgrade", {})
+        stats = base._replace(
+            upgraded=True,
+            speed=upgrade.get("speed", base.speed),
+            damage_f=upgrade.get("attackDamageTower", base.damage_f),
+            damage_i=upgrade.get("attackDamageWalker", base.damage_i),
+            attackRange=upgrade.get("attackRange", base.attackRange),
+            shieldRange=upgrade.get("shieldRange", base.shieldRange),
+            max_health=upgrade.get("startHealth", base.max_health),
+            shieldPerUnit=upgrade.get("shieldPerUnit", base.shieldPerUnit),
+            cost=(upgrade.get("cost1", 0) + base.cost[0], upgrade.get("cost2", 0) + base.cost[1]))
+    records[(unit_type, upgraded)] = stats
+    return stats
+
+
+_UNIT_CLASSES = {}
+
+def _get_unit_class(unit_type, config, upgraded=False):
+    """Gets the GameUnit subclass holding the stats of a unit type as class attributes, built once per stats record
+
+    """
+    stats = get_unit_stats(unit_type, config, upgraded)
+    cached = _UNIT_CLASSES.get(id(stats))
+    if cached is not None and cached[0] is stats:
+        return cached[1]
+    attributes = stats._asdict()
+    del attributes["cost"]
+    attributes["__slots__"] = ()
+    attributes["_stats"] = stats
+    unit_class = type("GameUnit", (GameUnit,), attributes)
+    _UNIT_CLASSES[id(stats)] = (stats, unit_class)
+    return unit_class
+
+
+def _restore_unit(unit_type, config, upgraded, player_index, health, x, y, pending_removal):
+    unit = GameUnit(unit_type, config, player_index, health, x, y)
+    if upgraded:
+        unit.upgrade()
+    unit.health = health
+    unit.pending_removal = pending_removal
+    return unit
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    Stats that are the same for every unit of a type and upgrade state are kept in one UnitStats record, 
+    exposed as class attributes of a GameUnit subclass made for that record. Units use __slots__, so a 
+    unit only stores its position, owner, health and flags. The stats should be treated as read only.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -32,47 +130,32 @@ class GameUnit:
         * upgraded (boolean): If this unit is upgraded
 
     """
+    __slots__ = ("player_index", "x", "y", "health", "pending_removal")
+
+    def __new__(cls, unit_type, config, *args, **kwargs):
+        if cls is GameUnit:
+            cls = _get_unit_class(unit_type, config)
+        return object.__new__(cls)
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
-        self.unit_type = unit_type
-        self.config = config
         self.player_index = player_index
         self.pending_removal = False
-        self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
         self.health = self.max_health if not health else health
 
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+    def __reduce__(self):
+        return (_restore_unit, (self.unit_type, self.config, self.upgraded, self.player_index, self.health, self.x, self.y, self.pending_removal))
 
+    @property
+    def cost(self):
+        return list(self._stats.cost)
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
-        self.upgraded = True
-
+        self.__class__ = _get_unit_class(self.unit_type, self.config, True)
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
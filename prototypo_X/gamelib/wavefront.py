@@ -0,0 +1,176 @@
+"""
+Optional NumPy backend for pathfinding.
+
+The WavefrontPathFinder computes the same pathlength field as the ShortestPathFinder, but grows the
+whole breadth first search frontier at once with array shifts instead of visiting one tile at a time.
+Because the arrays can carry a leading axis, many boards can be searched in the same call, which is
+what makes it worth using when scoring a batch of candidate layouts.
+
+NumPy is not required by the rest of gamelib. If it is not installed, HAS_NUMPY is False and creating
+a WavefrontPathFinder raises an ImportError.
+"""
+from .navigation import ShortestPathFinder, _get_arena_tables
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+
+_IN_BOUNDS_ARRAYS = {}
+
+def in_bounds_array(game_map):
+    """Gets a (ARENA_SIZE, ARENA_SIZE) boolean array of the tiles inside the arena, indexed [x, y]
+
+    """
+    size = game_map.ARENA_SIZE
+    in_bounds = _IN_BOUNDS_ARRAYS.get(size)
+    if in_bounds is None:
+        in_bounds = np.zeros(size * size, dtype=bool)
+        in_bounds[list(_get_arena_tables(game_map)[0])] = True
+        in_bounds = in_bounds.reshape(size, size)
+        in_bounds.flags.writeable = False
+        _IN_BOUNDS_ARRAYS[size] = in_bounds
+    return in_bounds
+
+
+def masks_to_arrays(masks, size):
+    """Converts bitboard masks into a stack of boolean arrays
+
+    Args:
+        masks: A list of integer masks, bit ``x * size + y`` being tile [x, y]
+        size: The size of the arena
+
+    Returns:
+        A (len(masks), size, size) boolean array indexed [board, x, y]
+
+    """
+    tiles = size * size
+    byte_count = (tiles + 7) // 8
+    buffer = b"".join(mask.to_bytes(byte_count, "little") for mask in masks)
+    bits = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8).reshape(len(masks), byte_count), axis=1, bitorder="little")
+    return bits[:, :tiles].reshape(len(masks), size, size).astype(bool)
+
+
+def pathlength_fields(blocked, seeds, in_bounds):
+    """Computes the breadth first search distance of every tile from a set of seed tiles
+
+    Gives the same distances as ShortestPathFinder._validate. Seeds get a pathlength of 0, blocked
+    seeds are never expanded and blocked tiles that are not seeds are never reached.
+
+    Args:
+        blocked: A boolean array of the tiles holding a structure, shape (..., size, size)
+        seeds: A boolean array of the tiles to search from, same shape as blocked
+        in_bounds: A (size, size) boolean array of the tiles inside the arena
+
+    Returns:
+        An int16 array shaped like blocked with the pathlength of each tile, -1 if unreached
+
+    """
+    seeds = seeds & in_bounds
+    passable = in_bounds & ~blocked
+    pathlength = np.where(seeds, 0, -1).astype(np.int16)
+    reached = seeds.copy()
+    frontier = seeds & passable
+    grown = np.empty_like(frontier)
+    distance = 0
+    while frontier.any():
+        distance += 1
+        #Move the frontier one tile up, down, right and left
+        grown[...] = False
+        grown[..., 1:] |= frontier[..., :-1]
+        grown[..., :-1] |= frontier[..., 1:]
+        grown[..., 1:, :] |= frontier[..., :-1, :]
+        grown[..., :-1, :] |= frontier[..., 1:, :]
+        frontier = grown & passable & ~reached
+        pathlength[frontier] = distance
+        reached |= frontier
+    return pathlength
+
+
+class WavefrontPathFinder(ShortestPathFinder):
+    """A ShortestPathFinder whose validation step runs on NumPy arrays
+
+    Paths and pathlengths are exactly those of ShortestPathFinder, so it can be passed to
+    GameState.set_path_finder() as a drop in replacement. navigate_layouts() searches many
+    structure layouts in a single batched call.
+
+    """
+    def __init__(self):
+        if not HAS_NUMPY:
+            raise ImportError("WavefrontPathFinder requires numpy")
+        super().__init__()
+
+    def _validate(self, ideal_tile, end_points):
+        """Wavefront search of the grid, setting the pathlengths of each tile
+
+        """
+        size = self.size
+        seeds = np.zeros(size * size, dtype=bool)
+        if self._is_end_point(ideal_tile):
+            seeds[list(self._end_point_indexes)] = True
+        else:
+            seeds[ideal_tile[0] * size + ideal_tile[1]] = True
+        blocked = np.array(self.blocked, dtype=bool)
+        visited = np.array(self.visited_validate, dtype=bool)
+        #Tiles reached by an earlier search keep their pathlength, like in the queue based search
+        blocked |= visited
+        seeds &= ~visited
+        field = pathlength_fields(blocked.reshape(size, size), seeds.reshape(size, size), in_bounds_array(self.game_state.game_map)).ravel()
+        reached = field >= 0
+        self.pathlength[:] = np.where(reached, field, self.pathlength).tolist()
+        self.visited_validate[:] = (reached | visited).tolist()
+
+    def navigate_layouts(self, start_point, end_points, game_state, layouts):
+        """Finds the path a unit would take on each of several structure layouts
+
+        Every layout is searched in the same batched wavefront, which is much cheaper than
+        pathing on each layout separately.
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+            * layouts: A list of bitboard masks, each the tiles that should be treated as holding a structure
+
+        Returns:
+            A list with, for each layout, the path navigate_multiple_endpoints would return if the map
+            held exactly those structures, or None if the start point is blocked in that layout.
+
+        """
+        self.initialize_map(game_state)
+        self._set_end_points(end_points)
+        self._bitboard = game_state.game_map.get_bitboard()
+        size = self.size
+        in_bounds = self._bitboard.in_bounds
+        start_bit = self._bitboard.bit(start_point)
+        layouts = [structures & in_bounds for structures in layouts]
+        if not layouts:
+            return []
+
+        blocked = masks_to_arrays(layouts, size)
+        seeds = np.zeros_like(blocked)
+        end_point_indexes = list(self._end_point_indexes)
+        for board, structures in enumerate(layouts):
+            if structures & start_bit:
+                continue
+            self._open = in_bounds & ~structures
+            ideal_tile = self._idealness_search(start_point, end_points)
+            if self._is_end_point(ideal_tile):
+                seeds[board].flat[end_point_indexes] = True
+            else:
+                seeds[board, ideal_tile[0], ideal_tile[1]] = True
+        fields = pathlength_fields(blocked, seeds, in_bounds_array(game_state.game_map))
+
+        paths = []
+        for board, structures in enumerate(layouts):
+            if structures & start_bit:
+                paths.append(None)
+                continue
+            self.blocked[:] = blocked[board].ravel().tolist()
+            self.pathlength[:] = fields[board].ravel().tolist()
+            self.next_hops[:] = self._cleared_next_hops
+            paths.append(self._get_path(start_point, end_points))
+        return paths
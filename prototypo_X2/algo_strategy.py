@@ -10,13 +10,17 @@ class AlgoStrategy(gamelib.AlgoCore):
         super().__init__()
         seed = random.randrange(maxsize)
         random.seed(seed)
-        gamelib.debug_write('Random seed: {}'.format(seed))
+        gamelib.log.info('Random seed: {}', seed)
+        # Action frames are not used, so every frame is skipped without being decoded
+        self.action_frame_events = []
+        # Read stdin on a background thread so frames sent during the long turns do not pile up in the pipe
+        self.threaded_input = True
 
     def on_game_start(self, config):
         """ 
         Read in config and perform any initial setup here 
         """
-        gamelib.debug_write('Configuring Prototypo_1...')
+        gamelib.log.info('Configuring Prototypo_1...')
         self.config = config
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
         WALL = config["unitInformation"][0]["shorthand"]
@@ -42,6 +46,14 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.build_exceptions = []
         self.threat_map = []
         self.set_build_queues()
+        # The threat map only changes when enemy turrets do, so it is computed during the action phase
+        self.add_speculative_job("threat_map", self.compute_threatmap, key=self.enemy_turret_key)
+        # When a turn runs long, reuse last turn's threat map and only path from some of the deploy locations
+        self.turn_budget = gamelib.TurnBudget.from_config(config)
+        self.turn_budget.add_fallback("threat_map", lambda game_state: self.threat_map or self.compute_threatmap(game_state))
+        self.turn_budget.add_fallback("safest_deploy", lambda game_state: self.find_safest_deploy_location(game_state, self.get_viable_deploy_locations(game_state)[::4]))
+        # Set to True to write how long each profiled step takes every turn to the replays folder
+        self.profile_turns = False
 
     def on_turn(self, turn_state):
         """
@@ -52,12 +64,13 @@ class AlgoStrategy(gamelib.AlgoCore):
         game engine.
         """
         game_state = gamelib.GameState(self.config, turn_state)
-        gamelib.debug_write('Performing turn {} of Prototypo_1'.format(game_state.turn_number))
+        gamelib.log.info('Performing turn {} of Prototypo_1', game_state.turn_number)
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
         self.turn_strategy(game_state)
 
         game_state.submit_turn()
+        self.speculate(game_state)
 
 
     """
@@ -149,13 +162,13 @@ class AlgoStrategy(gamelib.AlgoCore):
         turret_locations = [[3, 12], [24, 12], [4, 11], [23, 11], [5, 10], [22, 10], [8, 7], [19, 7], [12, 6], [15, 6]]
         num_spawned = game_state.attempt_spawn(TURRET, turret_locations)
         if num_spawned < len(turret_locations):
-            gamelib.debug_write('ERROR: Failed to spawn initial turrets: ' + str(num_spawned))
+            gamelib.log.error('Failed to spawn initial turrets: {}', num_spawned)
 
         # Place walls
         wall_locations = [[0, 13], [1, 13], [2, 13], [3, 13], [24, 13], [25, 13], [26, 13], [27, 13], [5, 12], [22, 12]]
         num_spawned = game_state.attempt_spawn(WALL, wall_locations)
         if num_spawned < len(wall_locations):
-            gamelib.debug_write('ERROR: Failed to spawn initial walls: '  + str(num_spawned))
+            gamelib.log.error('Failed to spawn initial walls: {}', num_spawned)
 
 
     """ Mark all unupgraded structures for removal """
@@ -165,20 +178,12 @@ class AlgoStrategy(gamelib.AlgoCore):
         for structure in base_structures:
             num_removed += game_state.attempt_remove(structure)
         if num_removed < len(base_structures):
-            gamelib.debug_write('ERROR: Failed to mark all base structures for removal')
+            gamelib.log.error('Failed to mark all base structures for removal')
 
 
     """ Returns list of positions containing base (or upgraded) structures """
     def get_structure_positions(self, game_state, upgraded = False):
-        positions = []
-        for x in range(0, 28):
-            for y in range(0, 28):
-                location = [x, y]
-                if game_state.game_map.in_arena_bounds(location):
-                    unit = game_state.contains_stationary_unit(location)
-                    if unit is not False and unit.player_index == 0 and unit.upgraded is upgraded:
-                        positions.append(location)
-        return positions
+        return game_state.game_map.get_unit_locations(0, [WALL, SUPPORT, TURRET], upgraded)
 
 
     """ Removed build exceptions from a given list of locations """
@@ -191,6 +196,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
 
     """ Build defenses """
+    @gamelib.profiled("build queue")
     def build_defenses(self, game_state, build_queue):
         for item in build_queue:
             filtered_locations = self.enforce_build_exceptions(item.iloc)
@@ -204,6 +210,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
 
     """ Build additional defenses and upgrades structures in a prioritized order """
+    @gamelib.profiled("build queue")
     def build_additional_defenses(self, game_state): 
         # Setup Queue
         build_queue = self.core_queue
@@ -240,6 +247,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
     """ TODO: Add more strategies """
     """ Determine if there is enough MP to attack and choose viable attack strategy """
+    @gamelib.profiled("attack strategy")
     def determine_attack_strategy(self, game_state):
         playerMP = int(game_state.get_resource(MP, 0))
         enemyMP = int(game_state.get_resource(MP, 1))
@@ -249,17 +257,17 @@ class AlgoStrategy(gamelib.AlgoCore):
             interceptor_check = int(game_state.turn_number * 0.7)
         if playerMP >= int(threshold):
             self.generate_threatmap(game_state)
-            safest_deployment = self.find_safest_deploy_location(game_state)
+            safest_deployment = self.turn_budget.run("safest_deploy", self.find_safest_deploy_location, game_state)
             path_is_blocked = False
             if safest_deployment[0] is None:
                 path_is_blocked = True
             else:
-                gamelib.debug_write('ATTACKING ::: Safest Point = ' + str(safest_deployment[0]))
-                gamelib.debug_write('ATTACKING ::: Safest Path = ' + str(game_state.find_path_to_edge(safest_deployment[0])))
-            gamelib.debug_write('ATTACKING ::: Path Blocked = ' + str(path_is_blocked))
+                gamelib.log.info('ATTACKING ::: Safest Point = {}', safest_deployment[0])
+                gamelib.log.debug('ATTACKING ::: Safest Path = {}', lambda: game_state.find_path_to_edge(safest_deployment[0]))
+            gamelib.log.info('ATTACKING ::: Path Blocked = {}', path_is_blocked)
             # Attack logic switching
-            if safest_deployment[1] < playerMP / 2 and not path_is_blocked:
-                gamelib.debug_write('ATTACKING ::: BASIC_SCOUT_ATTACK')
+            if self.is_safe_attack(safest_deployment, playerMP):
+                gamelib.log.info('ATTACKING ::: BASIC_SCOUT_ATTACK')
                 # relatively safe path exists for a single stack scout attack
                 self.attack_delay = 0
                 self.attack_status = BASIC_SCOUT_ATTACK
@@ -276,15 +284,15 @@ class AlgoStrategy(gamelib.AlgoCore):
                 corner_structure = game_state.contains_stationary_unit([0, 14])
                 use_demolishers = False
                 count = 0
-                gamelib.debug_write('ATTACKING ::: Corner Structure = ' + str(corner_structure))
+                gamelib.log.info('ATTACKING ::: Corner Structure = {}', corner_structure)
                 if corner_structure is None or corner_structure is False or corner_structure == SUPPORT or (corner_structure == TURRET and corner_structure.upgraded is False):
-                    gamelib.debug_write('ATTACKING ::: SNEAK_ATTACK UNDEFENDED')
+                    gamelib.log.info('ATTACKING ::: SNEAK_ATTACK UNDEFENDED')
                     count = int(playerMP / 3) + 1
                 elif (corner_structure == WALL and corner_structure.upgraded is False) or corner_structure == TURRET:
-                    gamelib.debug_write('ATTACKING ::: SNEAK_ATTACK BASIC WALL/UPGRADED TURRET')
+                    gamelib.log.info('ATTACKING ::: SNEAK_ATTACK BASIC WALL/UPGRADED TURRET')
                     count = int(playerMP * 3 / 4) + 1
                 elif corner_structure.upgraded:
-                    gamelib.debug_write('ATTACKING ::: SNEAK_ATTACK USING DEMOLISHERS')
+                    gamelib.log.info('ATTACKING ::: SNEAK_ATTACK USING DEMOLISHERS')
                     count = int((playerMP * 3 / 4) / 3)
                     use_demolishers = True
                 self.build_exceptions = [[0, 13], [1, 13], [1, 12], [2, 12]]
@@ -302,14 +310,14 @@ class AlgoStrategy(gamelib.AlgoCore):
                     game_state.attempt_spawn(SCOUT, spawn_loc2, playerMP - count)
                 # not blocked or underdefense 
             else:
-                gamelib.debug_write('ATTACKING ::: NO_ATTACK')
-                gamelib.debug_write('ATTACKING ::: Enemy MP = ' + str(enemyMP))
-                gamelib.debug_write('ATTACKING ::: Threshold = ' + str(max(9, min(30, game_state.turn_number * 0.75))))
+                gamelib.log.info('ATTACKING ::: NO_ATTACK')
+                gamelib.log.info('ATTACKING ::: Enemy MP = {}', enemyMP)
+                gamelib.log.info('ATTACKING ::: Threshold = {}', max(9, min(30, game_state.turn_number * 0.75)))
                 self.attack_status = NO_ATTACK
                 self.build_exceptions = [] 
             if enemyMP >= max(9, min(30, interceptor_check)) and self.attack_status == NO_ATTACK and game_state.turn_number < 15:
                 # spawn intercepters
-                gamelib.debug_write('ATTACKING ::: INTERCEPTING')
+                gamelib.log.info('ATTACKING ::: INTERCEPTING')
                 locations = [[10, 3], [17, 3]]
                 count = max(1, int(enemyMP / 12))
                 game_state.attempt_spawn(WALL, [13, 1])
@@ -323,26 +331,36 @@ class AlgoStrategy(gamelib.AlgoCore):
             self.build_exceptions = [[6, 9]]
             game_state.attempt_spawn(INTERCEPTOR, locations, count)
         else: 
-            gamelib.debug_write('ATTACKING ::: NO_ATTACK')
-            gamelib.debug_write('ATTACKING ::: Enemy MP = ' + str(enemyMP))
-            gamelib.debug_write('ATTACKING ::: Threshold = ' + str(max(9, min(30, game_state.turn_number * 0.75))))
+            gamelib.log.info('ATTACKING ::: NO_ATTACK')
+            gamelib.log.info('ATTACKING ::: Enemy MP = {}', enemyMP)
+            gamelib.log.info('ATTACKING ::: Threshold = {}', max(9, min(30, game_state.turn_number * 0.75)))
             self.attack_status = NO_ATTACK
             self.build_exceptions = [] 
 
 
     def all_core_defenses_built(self, game_state):
+        bitboard = game_state.game_map.get_bitboard()
         for item in self.core_queue:
-            for loc in item.iloc:
-                if game_state.contains_stationary_unit(loc) is False:
-                    return False
+            if bitboard.mask(item.iloc) & ~bitboard.structures:
+                return False
         return True
 
 
 
     """ Generate 2D array representing threat level at every location on the map """
+    @gamelib.profiled("threat map")
     def generate_threatmap(self, game_state):
-        self.threat_map = []
+        threat_map = self.speculative_result("threat_map", game_state)
+        if threat_map is None:
+            threat_map = self.turn_budget.run("threat_map", self.compute_threatmap, game_state)
+        self.threat_map = threat_map
+
+    """ Threat map of a board, run as a speculative job while the action phase plays out """
+    def compute_threatmap(self, game_state, cancelled = None):
+        threat_map = []
         for x in range(28):
+            if cancelled is not None and cancelled.is_set():
+                return None
             column = []
             for y in range(28):
                 location = [x, y]
@@ -354,26 +372,52 @@ class AlgoStrategy(gamelib.AlgoCore):
                 for turret in turrets_in_range:
                     threat_level += turret.damage_i
                 column.append(threat_level)
-            self.threat_map.append(column)
+            threat_map.append(column)
+        return threat_map
+
+
+    """ The enemy turrets on the board, the only units the threat map depends on at the start of a turn """
+    def enemy_turret_key(self, game_state):
+        units = game_state.game_map.get_bitboard().units
+        return (units.get((1, TURRET, False), 0), units.get((1, TURRET, True), 0))
 
 
     """ Generate 2D array representing threat level at every location on the map """
-    """ Return list of 2 items: location of safest point, and thread on path """
+    """ Return list of 2 items: location of safest point, and the number of scouts lost attacking from it with all our MP """
+    @gamelib.profiled("pathfinding")
     def find_safest_deploy_location(self, game_state, locations = None):
         deploy_locations = []
         if locations is None or len(locations) == 0:
             deploy_locations = self.get_viable_deploy_locations(game_state)
         else:
             deploy_locations = locations
+        scouts = int(game_state.get_resource(MP, 0))
+        if scouts < 1:
+            return [None, math.inf]
+        reachable_locations = [location for location in deploy_locations if self.check_path_blocked(game_state, location) is False]
+        if len(reachable_locations) == 0:
+            return [None, math.inf]
+        try:
+            simulator = gamelib.BatchSimulator(game_state)
+        except ImportError:
+            return self.find_lowest_threat_location(game_state, reachable_locations, scouts)
+        # Play out a stack of every scout we can afford from each location, all in one batch
+        results = simulator.run_many([[(SCOUT, location, scouts)] for location in reachable_locations])
+        scouts_lost = scouts - results.breaches
+        safest = min(range(len(reachable_locations)), key=lambda index: (scouts_lost[index], results.damage_taken[index]))
+        return [reachable_locations[safest], int(scouts_lost[safest])]
+
+
+    """ Without numpy, pick the location whose path crosses the least threat on the threat map """
+    """ Return the same as find_safest_deploy_location, the scouts lost being estimated from the threat along the path """
+    def find_lowest_threat_location(self, game_state, deploy_locations, scouts):
         safest_point = None
         safest_path = []
         safest_point_threat = math.inf
-        for deploy_loc in deploy_locations:
-            path = game_state.find_path_to_edge(deploy_loc)
+        deploy_paths = game_state.find_paths_to_edge(deploy_locations)
+        for deploy_loc, path in zip(deploy_locations, deploy_paths):
             if path is None or len(path) == 0:
-                gamelib.debug_write('Error: Path was None or empty list')
-            elif self.check_path_blocked(game_state, deploy_loc) is True:
-                continue
+                gamelib.log.error('Path was None or empty list')
             else: 
                 path_threat = 0
                 for path_loc in path:
@@ -382,12 +426,24 @@ class AlgoStrategy(gamelib.AlgoCore):
                     safest_point = deploy_loc
                     safest_path = path
                     safest_point_threat = path_threat
-        return [safest_point, safest_point_threat]
+        if safest_point is None:
+            return [None, math.inf]
+        # Turrets focus the lowest health scout of a stack, so the threat of every frame spent on a tile comes off the stack's total health
+        scout_information = self.config["unitInformation"][3]
+        frames_per_tile = max(1, int(round(1 / scout_information["speed"])))
+        scouts_lost = min(scouts, int(safest_point_threat * frames_per_tile // scout_information["startHealth"]))
+        return [safest_point, scouts_lost]
+
+
+    """ Whether a scout attack from the safest deployment loses few enough scouts to be worth sending """
+    def is_safe_attack(self, safest_deployment, playerMP):
+        return safest_deployment[0] is not None and safest_deployment[1] < playerMP / 2
 
 
     """ Finds all deployment locations that are not blocked """
     def get_viable_deploy_locations(self, game_state):
-        friendly_locations = game_state.game_map.get_edges()[2] + game_state.game_map.get_edges()[3]
+        edges = game_state.game_map.get_edges()
+        friendly_locations = edges[game_state.game_map.BOTTOM_LEFT] + edges[game_state.game_map.BOTTOM_RIGHT]
         viable_locations = []
         for location in friendly_locations:
             if game_state.contains_stationary_unit(location) is False:
@@ -397,19 +453,14 @@ class AlgoStrategy(gamelib.AlgoCore):
 
     """ Return true if enemy has blocked all paths to their edge """
     def check_path_blocked(self, game_state, deploy_point):
-        enemy_edges = game_state.game_map.get_edges()[0] + game_state.game_map.get_edges()[1]
-        predicted_path = game_state.find_path_to_edge(deploy_point)
-        if predicted_path[-1] in enemy_edges:
-            return False
-        else:
-            return True
+        return not game_state.can_reach_edge(deploy_point)
 
 
     """ Basic Single Stack Scout Attack """
     def basic_scout_attack(self, game_state, deploy_point, attack_size):
         spawn_count = game_state.attempt_spawn(SCOUT, deploy_point, attack_size)
         if (spawn_count < attack_size):
-            gamelib.debug_write('ERROR: Num spawned is {} but {} MP available'.format(spawn_count, game_state.get_resource(MP, 0)))
+            gamelib.log.error('Num spawned is {} but {} MP available', spawn_count, game_state.get_resource(MP, 0))
 
     """ TODO: Basic charge attack which waits to accumulate a certain number of MP and uses scouts 
         Returns 1 if attacking, 0 otherwise"""
@@ -417,7 +468,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         potential_locations = [[7, 6], [20, 6]]
         deploy_location = self.find_safest_deploy_location(game_state, potential_locations)[0]
         if deploy_location is None:
-            gamelib.debug_write('Error: SSA returned no deploy location... manually setting to [7, 6]')
+            gamelib.log.error('SSA returned no deploy location... manually setting to [7, 6]')
             deploy_location = [7, 6]
         if deploy_location == [7, 6]:
             deploy_location_2 = [6, 7]
@@ -426,13 +477,13 @@ class AlgoStrategy(gamelib.AlgoCore):
             deploy_location_2 = [21, 7]
             self.build_exceptions = [[6, 9], [6, 10], [7, 10]]
         else: 
-            gamelib.debug_write('ERROR: SSA returned unexpected deploy location: ' + str(deploy_location))
+            gamelib.log.error('SSA returned unexpected deploy location: {}', deploy_location)
             return
         stack_size = int(attack_size / 2)
         spawn_count = game_state.attempt_spawn(SCOUT, deploy_location, stack_size)
         spawn_count = game_state.attempt_spawn(SCOUT, deploy_location_2, stack_size)
         if (spawn_count < stack_size):
-            gamelib.debug_write('ERROR: Num spawned is {} but {} MP available'.format(spawn_count, attack_size))
+            gamelib.log.error('Num spawned is {} but {} MP available', spawn_count, attack_size)
 
 
     """ Basic demolisher attack to clear enemy base"""
@@ -476,7 +527,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         # spawn_count = game_state.attempt_spawn(SCOUT, deploy_point, attack_size)
         # if (spawn_count < attack_size):
-        #     gamelib.debug_write('ERROR: Num spawned is {} but {} MP available'.format(spawn_count, game_state.get_resource(MP, 0)))
+        #     gamelib.log.error('Num spawned is {} but {} MP available', spawn_count, game_state.get_resource(MP, 0))
         return
 
 """ Custom Class for representing upgrades in a queue"""
@@ -0,0 +1,195 @@
+"""
+Opt-in profiling of the steps of a turn.
+
+Wrap a step in ``with gamelib.profiler.span("threat map"):`` or decorate a method with
+``@gamelib.profiled("threat map")`` and, once profiling is enabled, the wall time and number of
+calls of each named span are recorded. AlgoCore enables it when profile_turns is set. It then
+writes a summary of every turn as one json line to a file in the replays folder, and can keep
+cProfile stats for the slowest turns. While profiling is off, spans and profiled functions only
+check a flag, so they can be left in a strategy.
+"""
+import cProfile
+import functools
+import heapq
+import json
+import os
+import sys
+import time
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ("profiler", "name", "began")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.perf_counter() - self.began)
+        return False
+
+
+def default_profile_path():
+    """A file in the replays folder the engine saves replays to, named after the algo and the time
+
+    """
+    algo_name = os.path.basename(os.path.dirname(os.path.abspath(sys.argv[0]))) or "algo"
+    return os.path.join("replays", "{}-{}.profile.jsonl".format(algo_name, time.strftime("%Y%m%d-%H%M%S")))
+
+
+class Profiler(object):
+    """Records wall time and call counts of named spans, turn by turn
+
+    Spans are inclusive, a span's time includes the time of any span run inside it.
+
+    Attributes :
+        * enabled (bool): Whether spans are recorded
+        * path (string): The file turn summaries are written to, one json line per turn
+        * slowest_turns (int): How many of the slowest turns to keep cProfile stats for, 0 for none
+        * spans (dict): The [calls, seconds] of each span name in the current turn
+        * totals (dict): The [calls, seconds] of each span name over the whole game
+
+    """
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.slowest_turns = 0
+        self.spans = {}
+        self.totals = {}
+        self._file = None
+        self._turn = None
+        self._turn_began = None
+        self._cprofile = None
+        self._slowest = []
+
+    def enable(self, path=None, slowest_turns=0):
+        """Starts recording spans
+
+        Args:
+            * path: The file to write turn summaries to, see default_profile_path() for the default
+            * slowest_turns: How many of the slowest turns to keep cProfile stats for. Every turn is then run under
+              cProfile, which slows it down, and the stats are written next to path when the profiler is closed
+
+        """
+        self.path = path if path is not None else default_profile_path()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = open(self.path, "w")
+        self.slowest_turns = slowest_turns
+        self.enabled = True
+
+    def span(self, name):
+        """A context manager recording the time spent in its block under name
+
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def profiled(self, name=None):
+        """A decorator recording the time spent in the decorated function, under name or the function's name
+
+        """
+        def decorator(function):
+            span_name = name if name is not None else function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, span_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        """Adds a call of a span that took seconds
+
+        """
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def start_turn(self, turn_number):
+        """Starts recording a new turn, called by AlgoCore before on_turn
+
+        """
+        if not self.enabled:
+            return
+        self.spans = {}
+        self._turn = turn_number
+        if self.slowest_turns > 0:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._turn_began = time.perf_counter()
+
+    def end_turn(self):
+        """Writes the summary of the current turn, called by AlgoCore after on_turn
+
+        """
+        if not self.enabled or self._turn_began is None:
+            return
+        seconds = time.perf_counter() - self._turn_began
+        self._turn_began = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            entry = (seconds, self._turn, self._cprofile)
+            if len(self._slowest) < self.slowest_turns:
+                heapq.heappush(self._slowest, entry)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+            self._cprofile = None
+        for name, (calls, span_seconds) in self.spans.items():
+            total = self.totals.setdefault(name, [0, 0.0])
+            total[0] += calls
+            total[1] += span_seconds
+        summary = {"turn": self._turn, "seconds": round(seconds, 6),
+                   "spans": {name: {"calls": calls, "seconds": round(span_seconds, 6)} for name, (calls, span_seconds) in self.spans.items()}}
+        self._file.write(json.dumps(summary) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Writes the cProfile stats of the slowest turns and closes the summary file, called by AlgoCore at the end of the game
+
+        Returns:
+            The paths of the cProfile stats files written
+
+        """
+        if not self.enabled:
+            return []
+        written = []
+        base = self.path[:-len(".jsonl")] if self.path.endswith(".jsonl") else self.path
+        for seconds, turn_number, profile in sorted(self._slowest, key=lambda entry: -entry[0]):
+            stats_path = "{}.turn{}.prof".format(base, turn_number)
+            profile.dump_stats(stats_path)
+            written.append(stats_path)
+        self._slowest = []
+        self._file.close()
+        self._file = None
+        self.enabled = False
+        return written
+
+
+profiler = Profiler()
+profiled = profiler.profiled
@@ -0,0 +1,123 @@
+"""
+Runs analysis for the next turn while the action phase of this one is played out.
+
+After an algo submits its turn, it sits idle until the engine has sent every action frame and the
+next turn state arrives. AlgoCore uses a SpeculativeJobs runner to spend that time on jobs the
+strategy registered, such as threat maps or path fields, computed on the board it already knows.
+When the real turn state arrives the jobs are cancelled, and each finished result is reused only if
+its key, for example the layout of the structures it depends on, still matches the new board.
+"""
+import threading
+import time
+import traceback
+
+from .debug_log import log
+
+
+def structure_key(game_state):
+    """The default job key, a fingerprint of every structure on the board
+
+    """
+    return game_state.game_map.structure_fingerprint()
+
+
+class SpeculativeJobs(object):
+    """Runs registered jobs on a worker thread and keeps their results for the next turn
+
+    Jobs run one after the other on a daemon thread. Python threads can not be stopped from the
+    outside, so a long job must check the cancelled event it is passed and return early once it is set,
+    or it keeps competing with on_turn for the interpreter. A result finished after the cancel is dropped.
+
+    Attributes :
+        * hits (int): The number of result() calls answered with a speculative result
+        * misses (int): The number of result() calls with no result or a result for a different board
+        * job_seconds (dict): How long the last run of each job took, in seconds
+
+    """
+    def __init__(self):
+        self._jobs = []
+        self._results = {}
+        self._thread = None
+        self._cancelled = None
+        self.hits = 0
+        self.misses = 0
+        self.job_seconds = {}
+
+    def add(self, name, job, key=None):
+        """Registers a job, see AlgoCore.add_speculative_job()
+
+        """
+        self._jobs = [entry for entry in self._jobs if entry[0] != name]
+        self._jobs.append((name, job, key if key is not None else structure_key))
+
+    def start(self, game_state):
+        """Cancels any running jobs and starts running every job on game_state
+
+        """
+        self.cancel()
+        if not self._jobs:
+            return
+        self._cancelled = threading.Event()
+        self._results = {}
+        self._thread = threading.Thread(target=self._run, args=(list(self._jobs), game_state, self._cancelled, self._results),
+                                        name="SpeculativeJobs", daemon=True)
+        self._thread.start()
+
+    def _run(self, jobs, game_state, cancelled, results):
+        for name, job, key in jobs:
+            if cancelled.is_set():
+                return
+            began = time.perf_counter()
+            try:
+                job_key = key(game_state)
+                result = job(game_state, cancelled)
+            except Exception:
+                log.error("Speculative job {} failed: {}", name, traceback.format_exc().rstrip())
+                continue
+            if cancelled.is_set():
+                return
+            results[name] = (job_key, result)
+            self.job_seconds[name] = time.perf_counter() - began
+
+    def cancel(self, timeout=0.05):
+        """Tells the running jobs to stop and waits a little for them to return. Finished results are kept
+
+        Args:
+            timeout: The most seconds to wait for the running job to return
+
+        """
+        if self._cancelled is not None:
+            self._cancelled.set()
+        self._cancelled = None
+        thread = self._thread
+        if thread is None:
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            # Kept so running() reports the job until it does return
+            log.warning("A speculative job is still running {:.3f}s after it was cancelled, it should check its cancelled event", timeout)
+        else:
+            self._thread = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Waits for the running jobs to finish, mostly useful in tests
+
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def result(self, name, game_state, default=None):
+        """Gets the result of a job if it was computed for a board matching game_state
+
+        """
+        entry = self._results.get(name)
+        for job_name, _, key in self._jobs:
+            if job_name == name and entry is not None and entry[0] == key(game_state):
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return default
@@ -0,0 +1,44 @@
+import unittest
+import json
+from unittest import mock
+import gamelib
+from gamelib import tests
+from gamelib.wavefront import HAS_NUMPY
+from algo_strategy import AlgoStrategy
+
+class AlgoStrategyTests(unittest.TestCase):
+
+    def make_board(self, MP, turrets=(), upgraded=()):
+        config = tests.BasicTests().make_turn_0_map().config
+        turn = {"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,1,-1],"p1Stats":[30.0,25.0,MP,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{}}
+        state = gamelib.GameState(config, json.dumps(turn))
+        state.suppress_warnings(True)
+        for location in turrets:
+            state.game_map.add_unit("DF", location, 1)
+        for location in upgraded:
+            state.game_map.upgrade_unit(location)
+        algo = AlgoStrategy()
+        algo.on_game_start(config)
+        algo.threat_map = algo.compute_threatmap(state)
+        return algo, state
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_safest_deploy_location(self):
+        boards = [(5, [], []), (0, [], []), (8, [[x, 14] for x in range(0, 28, 3)], []), (15, [[x, 14] for x in range(0, 28, 3)], []),
+                  (10, [[x, 14] for x in range(0, 28, 2)], [[x, 14] for x in range(0, 28, 4)])]
+        decisions = []
+        for MP, turrets, upgraded in boards:
+            algo, state = self.make_board(MP, turrets, upgraded)
+            simulated = algo.find_safest_deploy_location(state)
+            with mock.patch.object(gamelib, "BatchSimulator", side_effect=ImportError):
+                estimated = algo.find_safest_deploy_location(state)
+            self.assertEqual(algo.is_safe_attack(simulated, MP), algo.is_safe_attack(estimated, MP),
+                             "Simulated {} and estimated {} scouts lost should agree on attacking with {} MP".format(simulated, estimated, MP))
+            decisions.append(algo.is_safe_attack(simulated, MP))
+        self.assertEqual([True, False, True, True, False], decisions, "Open boards and light defenses should be attacked, heavy defenses not")
+
+        algo, state = self.make_board(0)
+        self.assertEqual([None, float("inf")], algo.find_safest_deploy_location(state), "Without MP there should be no scouts to simulate")
+
+if __name__ == '__main__':
+    unittest.main()
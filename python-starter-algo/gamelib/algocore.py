@@ -1,8 +1,90 @@
 import json
+import re
+import time
 
 from .game_state import GameState
+from .debug_log import log
+from .profiling import profiler
+from .speculation import SpeculativeJobs
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
+
+_TURN_TYPE = re.compile(r'"turnInfo"\s*:\s*(\[)\s*(\d+)')
+_EVENTS = re.compile(r'"events"\s*:\s*\{')
+_EVENT_PATTERNS = {}
+_EVENT_TYPES = ("selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee")
+_DECODER = json.JSONDecoder()
+
+def get_message_type(message):
+    """Reads the message type, turnInfo[0], of an engine message without decoding the rest of it
+
+    Args:
+        message: A message string from the game engine
+
+    Returns:
+        0 for a turn, 1 for an action frame, 2 for the end of the game, or None if the message has no turnInfo
+
+    """
+    match = _TURN_TYPE.search(message)
+    if match is None:
+        return None
+    return int(match.group(2))
+
+
+def decode_events(message, event_types):
+    """Decodes only some of the event lists of an action frame message
+
+    Each event list is found with a regex and decoded on its own, so the units and the other events
+    in the frame are never decoded.
+
+    Args:
+        message: An action frame message string from the game engine
+        event_types: The names of the event lists to decode, for example ["breach", "death"]
+
+    Returns:
+        A dict from each event type to its decoded list, empty if the frame has no such events
+
+    """
+    events = {}
+    start = _EVENTS.search(message)
+    for event_type in event_types:
+        match = _event_pattern(event_type).search(message, start.end()) if start is not None else None
+        if match is None or message.startswith("[]", match.end()):
+            events[event_type] = []
+        else:
+            events[event_type] = _DECODER.raw_decode(message, match.end())[0]
+    return events
+
+
+def get_event_types(message):
+    """Finds which event lists of an action frame message have events in them, without decoding them
+
+    Args:
+        message: An action frame message string from the game engine
+
+    Returns:
+        The names of the event lists that are not empty, for example ["move", "death"]
+
+    """
+    start = _EVENTS.search(message)
+    if start is None:
+        return []
+    event_types = []
+    for event_type in _EVENT_TYPES:
+        match = _event_pattern(event_type).search(message, start.end())
+        if match is not None and not message.startswith("[]", match.end()):
+            event_types.append(event_type)
+    return event_types
+
+
+def _event_pattern(event_type):
+    pattern = _EVENT_PATTERNS.get(event_type)
+    if pattern is None:
+        pattern = re.compile(r'"{}"\s*:\s*'.format(re.escape(event_type)))
+        _EVENT_PATTERNS[event_type] = pattern
+    return pattern
+
+
 class AlgoCore(object):
     """
     This class handles communication with the game engine. \n
@@ -10,10 +92,28 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * action_frame_events (list): The event types on_action_frame is interested in, for example ["breach"]. 
+          When set, only those event lists are decoded and frames where they are all empty are skipped, 
+          see decode_action_frame(). None, the default, passes every frame fully decoded.
+        * threaded_input (bool): Whether stdin is read by a background MessageReader thread, see reader.py. 
+          Skipped action frames then never delay a turn. False by default.
+        * speculative_jobs (:obj: SpeculativeJobs): Runs the jobs added with add_speculative_job() during the action phase
+        * turn_budget (:obj: TurnBudget): If set, its clock is started as soon as each turn message arrives, see budget.py. None by default
+        * profile_turns (bool): Whether gamelib.profiler records the spans of every turn, see profiling.py. False by default
+        * profile_slowest_turns (int): With profile_turns, how many of the slowest turns to keep cProfile stats for
 
     """
+    action_frame_events = None
+    threaded_input = False
+    turn_budget = None
+    profile_turns = False
+    profile_slowest_turns = 0
+
     def __init__(self):
         self.config = None
+        self._reader = None
+        self._speculative_state = None
+        self.speculative_jobs = SpeculativeJobs()
 
     def on_game_start(self, config):
         """
@@ -26,7 +126,7 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        It is passed the current game state, already decoded from json into a dict, which can be used to initiate a new GameState object. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -38,11 +138,91 @@ class AlgoCore(object):
         """
         After each deploy phase, the game engine will run the action phase of the round.
         The action phase is made up of a sequence of distinct frames. 
-        Each of these frames is sent to the algo in order. 
+        Each of these frames is sent to the algo in order, already decoded from json into a dict. 
         They can be handled in this function. 
+        If action_frame_events is set, the dict only holds turnInfo and the subscribed event lists, 
+        and frames without any of those events are never passed here.
         """
         pass
 
+    def decode_action_frame(self, message):
+        """Decodes an action frame message for on_action_frame
+
+        Args:
+            message: The action frame message string from the game engine
+
+        Returns:
+            The frame as a dict, or None if it holds none of the events in action_frame_events. 
+            With action_frame_events set, the dict only has the turnInfo and events keys, and events 
+            only has the subscribed event lists.
+
+        """
+        if self.action_frame_events is None:
+            return json.loads(message)
+        events = decode_events(message, self.action_frame_events)
+        if not any(events.values()):
+            return None
+        turn_info = _DECODER.raw_decode(message, _TURN_TYPE.search(message).start(1))[0]
+        return {"turnInfo": turn_info, "events": events}
+
+    def add_speculative_job(self, name, job, key=None):
+        """Registers a job to run in the idle time between submitting a turn and receiving the next one
+
+        Once on_turn returns, every job runs on a worker thread on the GameState passed to speculate(). 
+        The jobs are cancelled when the next turn arrives, and their results can then be fetched with 
+        speculative_result().
+
+        Args:
+            * name: The name the result is stored under. Adding a job with the same name replaces it
+            * job: Called as job(game_state, cancelled), cancelled being a threading.Event that is set when the 
+              next turn arrives. Jobs must check it often and return early once it is set: a job that keeps running 
+              holds up on_turn, which shares the interpreter with it. Whatever it returns is the result
+            * key: Called as key(game_state), a result is only reused on a board with the same key. 
+              Defaults to the structure fingerprint of the map, so any structure change discards the result
+
+        """
+        self.speculative_jobs.add(name, job, key)
+
+    def speculate(self, game_state):
+        """Sets the GameState the speculative jobs run on once on_turn returns
+
+        Call it in on_turn after submit_turn(). The state must not be changed afterwards, the jobs read it from another thread.
+
+        """
+        self._speculative_state = game_state
+
+    def speculative_result(self, name, game_state, default=None):
+        """Gets the result of a speculative job, if it was computed on a board matching game_state
+
+        Args:
+            * name: The name of the job
+            * game_state: The GameState of the current turn
+            * default: Returned if the job did not finish in time or its key does not match game_state
+
+        Returns:
+            The job's result or default
+
+        """
+        return self.speculative_jobs.result(name, game_state, default)
+
+    def span(self, name):
+        """A context manager recording the wall time and calls of a step of the turn while profile_turns is set
+
+        Use it as ``with self.span("threat map"):``. The gamelib.profiled decorator does the same for whole methods.
+
+        """
+        return profiler.span(name)
+
+    def turn_waiting(self):
+        """Checks if the next turn has already arrived and is waiting to be handled
+
+        Only works with threaded_input, the engine can not be checked without blocking otherwise.
+
+        Returns:
+            True if a turn or end of game message is waiting, False otherwise
+
+        """
+        return self._reader is not None and self._reader.turn_arrived.is_set()
 
     def start(self):
         """ 
@@ -52,11 +232,23 @@ class AlgoCore(object):
         The algo continues this loop until it recieves the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        if self.threaded_input:
+            from .reader import MessageReader
+            self._reader = MessageReader(self.decode_action_frame).start()
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
+            frame = None
+            if self._reader is None:
+                game_state_string = get_command()
+                arrived = time.perf_counter()
+            else:
+                game_state_string, frame = self._reader.get()
+                arrived = self._reader.arrived
+                if game_state_string is None:
+                    debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+                    exit()
             if "replaySave" in game_state_string:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
@@ -64,23 +256,47 @@ class AlgoCore(object):
                 parsed_config = json.loads(game_state_string)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                # The message type is sniffed without decoding, each message is then decoded at most once
+                stateType = get_message_type(game_state_string)
+                if stateType is None:
+                    stateType = int(json.loads(game_state_string).get("turnInfo")[0])
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    if self.turn_budget is not None:
+                        self.turn_budget.start(arrived)
+                    self.speculative_jobs.cancel()
+                    self._speculative_state = None
+                    state = json.loads(game_state_string)
+                    if self.profile_turns and not profiler.enabled:
+                        profiler.enable(slowest_turns=self.profile_slowest_turns)
+                        debug_write("Profiling turns to {}".format(profiler.path))
+                    profiler.start_turn(state["turnInfo"][1])
+                    try:
+                        self.on_turn(state)
+                    finally:
+                        profiler.end_turn()
+                        # Buffered debug records are written once per turn
+                        log.flush()
+                    if self._speculative_state is not None:
+                        self.speculative_jobs.start(self._speculative_state)
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    if frame is None:
+                        frame = self.decode_action_frame(game_state_string)
+                    if frame is not None:
+                        self.on_action_frame(frame)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
+                    self.speculative_jobs.cancel()
+                    profiler.close()
+                    log.flush()
                     debug_write("Got end state, game over. Stopping algo.")
                     break
                 else:
@@ -0,0 +1,119 @@
+"""
+Deadline aware turn budget.
+
+The engine starts damaging an algo once a turn takes longer than waitTimeBotSoft, and skips its turn
+entirely after waitTimeBotMax. A TurnBudget lets a strategy check how much of its turn is left, and
+run expensive analyses through run() with a cheaper fallback that is used instead once the time
+left would not cover the analysis.
+"""
+import time
+
+from .debug_log import log
+
+
+class TurnBudget(object):
+    """Tracks the time left in the current turn and picks between analyses and their fallbacks
+
+    Set it as the turn_budget of an AlgoStrategy and AlgoCore starts the clock as soon as each turn
+    message arrives, before it is even decoded.
+
+    Attributes :
+        * seconds (float): The time a turn may take, in seconds
+        * reserve (float): Seconds kept back for submitting the turn. Fallbacks are used once running the full analysis would eat into them
+        * fired (list): The names of the fallbacks used this turn, in order
+        * fired_counts (dict): How often each fallback was used over the whole game. Each fallback used is also logged as a warning
+
+    """
+    def __init__(self, seconds=3.0, reserve=0.25, clock=time.perf_counter):
+        """ Sets up a budget, start() must be called at the start of each turn
+
+        Args:
+            * seconds: The time a turn may take, in seconds
+            * reserve: Seconds kept back for submitting the turn
+            * clock: The clock to measure time with, in seconds
+
+        """
+        self.seconds = seconds
+        self.reserve = reserve
+        self.fired = []
+        self.fired_counts = {}
+        self._clock = clock
+        self._started = clock()
+        self._fallbacks = {}
+        self._durations = {}
+
+    @classmethod
+    def from_config(cls, config, fraction=0.8, reserve=0.25):
+        """Makes a budget covering part of the time a turn may take before the engine deals time damage
+
+        Args:
+            * config: The game config
+            * fraction: The share of waitTimeBotSoft the budget covers
+            * reserve: Seconds kept back for submitting the turn
+
+        """
+        soft_limit = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 3000) / 1000
+        return cls(soft_limit * fraction, reserve)
+
+    def start(self, started=None):
+        """Starts the clock for a new turn
+
+        Args:
+            started: The clock time the turn message arrived, now if None
+
+        """
+        self._started = self._clock() if started is None else started
+        self.fired = []
+
+    def elapsed(self):
+        """The seconds since the turn started
+
+        """
+        return self._clock() - self._started
+
+    def remaining(self):
+        """The seconds left in the turn, negative once it ran over
+
+        """
+        return self.seconds - self.elapsed()
+
+    def is_low(self, needed=0.0):
+        """Checks if spending needed more seconds would leave less than the reserve
+
+        """
+        return self.remaining() - needed < self.reserve
+
+    def add_fallback(self, name, fallback):
+        """Registers a cheaper fallback for an analysis run with run()
+
+        Args:
+            * name: The name of the analysis
+            * fallback: Called with the same arguments as the analysis when the budget is low. It must return the same kind of result
+
+        """
+        self._fallbacks[name] = fallback
+
+    def run(self, name, analysis, *args, **kwargs):
+        """Runs an analysis, or its fallback if the time left would not cover it
+
+        The time the analysis took the last time it ran is used as the estimate of how long it needs.
+        Analyses without a fallback always run.
+
+        Args:
+            * name: The name of the analysis, matching add_fallback()
+            * analysis: The full analysis, called with args and kwargs
+
+        Returns:
+            The result of the analysis or of its fallback
+
+        """
+        fallback = self._fallbacks.get(name)
+        if fallback is not None and self.is_low(self._durations.get(name, 0.0)):
+            self.fired.append(name)
+            self.fired_counts[name] = self.fired_counts.get(name, 0) + 1
+            log.warning("Turn budget low, {:.3f}s left: using the fallback for {}", self.remaining(), name)
+            return fallback(*args, **kwargs)
+        began = self._clock()
+        result = analysis(*args, **kwargs)
+        self._durations[name] = self._clock() - began
+        return result
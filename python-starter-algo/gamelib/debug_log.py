@@ -0,0 +1,93 @@
+"""
+Buffered, leveled debug logging.
+
+debug_write() formats, writes and flushes stderr on every call, which adds up when a strategy logs
+every step of every turn. The DebugLog keeps its records in memory and writes them all at once
+when flushed, which AlgoCore does after each turn and at the end of the game. Records below the
+log's level are dropped before their message is formatted, and arguments that are callables are
+only called for records that are kept, so expensive debug output costs nothing at the PRODUCTION level.
+"""
+import atexit
+import sys
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+PRODUCTION = ERROR
+
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+class DebugLog(object):
+    """Buffers formatted debug records until flush() writes them
+
+    Attributes :
+        * level (int): Records below this level are dropped without being formatted
+        * records (list): The formatted records waiting to be flushed
+
+    """
+    def __init__(self, level=INFO, stream=None):
+        """ Sets up the log
+
+        Args:
+            * level: The lowest level that is kept, one of DEBUG, INFO, WARNING, ERROR or PRODUCTION
+            * stream: The stream records are flushed to, sys.stderr by default
+
+        """
+        self.level = level
+        self.records = []
+        self._stream = stream
+
+    def set_level(self, level):
+        self.level = level
+
+    def is_enabled(self, level):
+        """Checks if records of a level are kept, useful to skip building expensive debug output
+
+        """
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Buffers a record if its level is enabled
+
+        Args:
+            * level: The level of the record
+            * message: The message, formatted with message.format(*args)
+            * args: The format arguments. Callables are called, without arguments, to get their value
+
+        """
+        if level < self.level:
+            return
+        if args:
+            message = message.format(*[arg() if callable(arg) else arg for arg in args])
+        self.records.append("{}: {}".format(_LEVEL_NAMES.get(level, level), message))
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def flush(self):
+        """Writes every buffered record to the stream in a single write
+
+        """
+        if not self.records:
+            return
+        stream = self._stream if self._stream is not None else sys.stderr
+        stream.write("\n".join(self.records) + "\n")
+        stream.flush()
+        self.records = []
+
+
+log = DebugLog()
+# Keeps the last records when the algo exits without reaching the end of the game, for example on EOF or a crash
+atexit.register(log.flush)
@@ -0,0 +1,369 @@
+"""
+Frame by frame simulation of the action phase.
+
+An ActionSimulator takes a snapshot of a GameState, structures and any mobile units already spawned
+with attempt_spawn, and plays out the action phase that would follow a set of deploys: units walk
+their paths at their speed, supports shield them, every unit with damage attacks the target
+get_target would pick, stranded units self destruct and units reaching their target edge breach.
+The snapshot, the tiles in range of each structure and the paths for each structure layout are
+kept between runs, so one simulator can score hundreds of candidate deploys per turn.
+
+Each frame is played in this order: movement, breaches and self destructs, shields, attacks, then
+removing the destroyed units. Attacks are simultaneous, every target is picked before any damage
+is dealt. A unit at the end of its path breaches, or self destructs, when it would next move.
+"""
+from .unit import get_unit_stats
+
+
+class SimulationResult(object):
+    """The outcome of a simulated action phase
+
+    Attributes :
+        * frames (int): The number of frames played before every mobile unit was gone, or the frame limit was reached
+        * breaches (list): A [location, unit_type, player_index] entry for each unit that reached its target edge
+        * health_lost (list): The health each player lost to breaches, indexed by player
+        * damage_dealt (list): The damage each player's units dealt to enemy units, indexed by player
+        * structure_damage (list): The part of damage_dealt dealt to structures, indexed by player
+        * destroyed (list): A [location, unit_type, player_index] entry for each structure destroyed
+        * self_destructs (list): A [location, unit_type, player_index] entry for each unit that self destructed
+        * remaining (int): The number of mobile units still on the board when the simulation stopped
+        * frame_units (list): Only filled by run(record_frames=True). For each frame, a dict mapping the spawn index of each mobile unit still alive to its (x, y, health)
+        * frame_structures (list): Only filled by run(record_frames=True). For each frame, a dict mapping the tile of each structure still standing to its health
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breaches = []
+        self.health_lost = [0.0, 0.0]
+        self.damage_dealt = [0.0, 0.0]
+        self.structure_damage = [0.0, 0.0]
+        self.destroyed = []
+        self.self_destructs = []
+        self.remaining = 0
+        self.frame_units = []
+        self.frame_structures = []
+
+    def __repr__(self):
+        return "SimulationResult(frames={}, breaches={}, health_lost={}, damage_dealt={}, destroyed={})".format(
+            self.frames, len(self.breaches), self.health_lost, self.damage_dealt, len(self.destroyed))
+
+
+class _Rules(object):
+    """The stats of a unit type and upgrade state the simulation needs, including those UnitStats leaves out"""
+    __slots__ = ("unit_type", "stationary", "damage_f", "damage_i", "attack_range", "shield_range", "shield_per_unit",
+                 "shield_bonus_per_y", "max_health", "move_interval", "self_destruct_range", "self_destruct_damage_f",
+                 "self_destruct_damage_i", "self_destruct_steps", "breach_damage")
+
+    def __init__(self, config, unit_type, upgraded):
+        stats = get_unit_stats(unit_type, config, upgraded)
+        type_config = next(information for information in config["unitInformation"] if information.get("shorthand") == unit_type)
+        if upgraded:
+            type_config = dict(type_config, **type_config.get("upgrade", {}))
+        self.unit_type = unit_type
+        self.stationary = stats.stationary
+        self.damage_f = stats.damage_f
+        self.damage_i = stats.damage_i
+        self.attack_range = stats.attackRange
+        self.shield_range = stats.shieldRange
+        self.shield_per_unit = stats.shieldPerUnit
+        self.shield_bonus_per_y = type_config.get("shieldBonusPerY", 0)
+        self.max_health = stats.max_health
+        self.move_interval = max(1, int(round(1 / stats.speed))) if stats.speed else 0
+        self.self_destruct_range = type_config.get("selfDestructRange", 0)
+        self.self_destruct_damage_f = type_config.get("selfDestructDamageTower", 0)
+        self.self_destruct_damage_i = type_config.get("selfDestructDamageWalker", 0)
+        self.self_destruct_steps = type_config.get("selfDestructStepsRequired", 0)
+        self.breach_damage = type_config.get("playerBreachDamage", 1)
+
+
+class _Unit(object):
+    __slots__ = ("rules", "player_index", "x", "y", "tile", "health", "order", "target_edge", "path", "path_index",
+                 "steps", "next_move", "shielded_by")
+
+
+class ActionSimulator(object):
+    """Plays out the action phase that follows a turn, on a snapshot of a GameState
+
+    Attributes :
+        * game_state (GameState): The state the simulator was built from. Its pathfinder and path cache are used to path units
+        * max_frames (int): Simulations stop after this many frames, even with units left on the board
+
+    """
+    def __init__(self, game_state, max_frames=400):
+        """ Takes the snapshot. Changes made to game_state later are not seen by the simulator
+
+        Args:
+            * game_state: The GameState to simulate, any unit added with attempt_spawn is included
+            * max_frames: Simulations stop after this many frames
+
+        """
+        self.game_state = game_state
+        self.max_frames = max_frames
+        game_map = game_state.game_map
+        self._config = game_state.config
+        self._size = game_state.ARENA_SIZE
+        self._center = game_state.HALF_ARENA - 0.5
+        self._rules = {}
+        self._range_masks = {}
+        self._paths = {}
+        self._edge_masks = [self._mask(game_map._edge_tiles(edge)) for edge in range(4)]
+
+        # Structures are kept as (tile, player_index, rules, health), mobile units as (rules, player_index, location, health)
+        self._structures = []
+        self._mobiles = []
+        for unit in game_map.get_units():
+            rules = self._get_rules(unit.unit_type, unit.upgraded)
+            if unit.stationary:
+                # Structures marked for removal still stand until the action phase is over
+                self._structures.append((unit.x * self._size + unit.y, unit.player_index, rules, unit.health))
+            else:
+                self._mobiles.append((rules, unit.player_index, [unit.x, unit.y], unit.health))
+        self._base_structures = 0
+        for tile, _, _, _ in self._structures:
+            self._base_structures |= 1 << tile
+
+    def _get_rules(self, unit_type, upgraded=False):
+        rules = self._rules.get((unit_type, upgraded))
+        if rules is None:
+            rules = _Rules(self._config, unit_type, upgraded)
+            self._rules[(unit_type, upgraded)] = rules
+        return rules
+
+    def _mask(self, locations):
+        mask = 0
+        for x, y in locations:
+            mask |= 1 << (x * self._size + y)
+        return mask
+
+    def _range_mask(self, tile, radius):
+        """The mask of the tiles in range of a tile, as get_locations_in_range sees them"""
+        key = (tile, radius)
+        mask = self._range_masks.get(key)
+        if mask is None:
+            location = [tile // self._size, tile % self._size]
+            mask = self._mask(self.game_state.game_map.get_locations_in_range(location, radius))
+            self._range_masks[key] = mask
+        return mask
+
+    def _path(self, structures, tile, target_edge):
+        """The tiles of the path from tile to target_edge on a layout, starting with tile itself"""
+        key = (structures, tile, target_edge)
+        path = self._paths.get(key)
+        if path is None:
+            location = [tile // self._size, tile % self._size]
+            locations = self.game_state._path_for_structures(structures, location, target_edge) or [location]
+            path = tuple(x * self._size + y for x, y in locations)
+            self._paths[key] = path
+        return path
+
+    def run(self, deploys=(), enemy_deploys=(), record_frames=False):
+        """Simulates the action phase with extra mobile units deployed
+
+        Args:
+            * deploys: Your extra deploys, a list of (unit_type, location, num) entries. Deploys on a structure are ignored, like the engine rejects them
+            * enemy_deploys: Your opponent's deploys, in the same form
+            * record_frames: Whether to record the state of every frame, which is slower. Mobile units are numbered in spawn
+              order, first those already in the snapshot, then deploys and then enemy_deploys, each in the order given
+
+        Returns:
+            A SimulationResult
+
+        """
+        size = self._size
+        center = self._center
+        result = SimulationResult()
+
+        # Per run copies of the snapshot
+        structure_at = {}
+        attackers = []
+        shielders = []
+        structure_masks = [0, 0]
+        for tile, player_index, rules, health in self._structures:
+            unit = _Unit()
+            unit.rules = rules
+            unit.player_index = player_index
+            unit.tile = tile
+            unit.x = tile // size
+            unit.y = tile % size
+            unit.health = health
+            unit.order = len(structure_at)
+            structure_at[tile] = unit
+            structure_masks[player_index] |= 1 << tile
+            if rules.damage_i or rules.damage_f:
+                attackers.append((unit, self._range_mask(tile, rules.attack_range)))
+            if rules.shield_per_unit or rules.shield_bonus_per_y:
+                y_bonus = unit.y if player_index == 0 else size - 1 - unit.y
+                shielders.append((unit, self._range_mask(tile, rules.shield_range), rules.shield_per_unit + rules.shield_bonus_per_y * y_bonus))
+        structures = self._base_structures
+
+        spawns = list(self._mobiles)
+        for player_index, player_deploys in ((0, deploys), (1, enemy_deploys)):
+            for entry in player_deploys:
+                unit_type, location = entry[0], entry[1]
+                num = entry[2] if len(entry) > 2 else 1
+                rules = self._get_rules(unit_type)
+                if self._base_structures >> (location[0] * size + location[1]) & 1:
+                    # The engine rejects spawns on a structure
+                    continue
+                for _ in range(num):
+                    spawns.append((rules, player_index, location, rules.max_health))
+        mobiles = []
+        for rules, player_index, location, health in spawns:
+            unit = _Unit()
+            unit.rules = rules
+            unit.player_index = player_index
+            unit.x, unit.y = location
+            unit.tile = unit.x * size + unit.y
+            unit.health = health
+            unit.order = len(mobiles)
+            unit.target_edge = self.game_state.get_target_edge(location)
+            unit.path = None
+            unit.path_index = 0
+            unit.steps = 0
+            unit.next_move = rules.move_interval
+            unit.shielded_by = set()
+            mobiles.append(unit)
+
+        frame = 0
+        while mobiles and frame < self.max_frames:
+            frame += 1
+
+            # Movement, breaches and self destructs
+            gone = False
+            for unit in mobiles:
+                if frame < unit.next_move:
+                    continue
+                unit.next_move += unit.rules.move_interval
+                if unit.path is None:
+                    unit.path = self._path(structures, unit.tile, unit.target_edge)
+                    unit.path_index = 0
+                if unit.path_index + 1 < len(unit.path):
+                    unit.path_index += 1
+                    unit.tile = unit.path[unit.path_index]
+                    unit.x = unit.tile // size
+                    unit.y = unit.tile % size
+                    unit.steps += 1
+                    continue
+                rules = unit.rules
+                enemy = 1 - unit.player_index
+                location = [unit.x, unit.y]
+                if self._edge_masks[unit.target_edge] >> unit.tile & 1:
+                    result.breaches.append([location, rules.unit_type, unit.player_index])
+                    result.health_lost[enemy] += rules.breach_damage
+                else:
+                    result.self_destructs.append([location, rules.unit_type, unit.player_index])
+                    if unit.steps >= rules.self_destruct_steps:
+                        in_range = self._range_mask(unit.tile, rules.self_destruct_range)
+                        for other in mobiles:
+                            if other.player_index == enemy and other.health > 0 and in_range >> other.tile & 1:
+                                other.health -= rules.self_destruct_damage_i
+                                result.damage_dealt[unit.player_index] += rules.self_destruct_damage_i
+                        hits = in_range & structure_masks[enemy]
+                        while hits:
+                            low_bit = hits & -hits
+                            hits ^= low_bit
+                            structure_at[low_bit.bit_length() - 1].health -= rules.self_destruct_damage_f
+                            result.damage_dealt[unit.player_index] += rules.self_destruct_damage_f
+                            result.structure_damage[unit.player_index] += rules.self_destruct_damage_f
+                unit.health = 0
+                gone = True
+            if gone:
+                mobiles = [unit for unit in mobiles if unit.health > 0]
+
+            mobiles_at = {}
+            mobile_masks = [0, 0]
+            for unit in mobiles:
+                mobiles_at.setdefault(unit.tile, []).append(unit)
+                mobile_masks[unit.player_index] |= 1 << unit.tile
+
+            # Shields, each support shields each unit once
+            for support, in_range, amount in shielders:
+                if support.health <= 0:
+                    continue
+                hits = in_range & mobile_masks[support.player_index]
+                while hits:
+                    low_bit = hits & -hits
+                    hits ^= low_bit
+                    for unit in mobiles_at[low_bit.bit_length() - 1]:
+                        if unit.player_index == support.player_index and support.order not in unit.shielded_by:
+                            unit.shielded_by.add(support.order)
+                            unit.health += amount
+
+            # Attacks, every target is picked before damage is dealt. Most attackers have nothing in range, which one mask test rules out
+            strikes = []
+            targets = [mobile_masks[0] | structure_masks[0], mobile_masks[1] | structure_masks[1]]
+            for attacker, in_range in attackers:
+                if in_range & targets[1 - attacker.player_index]:
+                    target = self._pick_target(attacker, in_range, mobiles_at, mobile_masks, structure_at, structure_masks, center)
+                    if target is not None:
+                        strikes.append((attacker, target))
+            for attacker in mobiles:
+                in_range = self._range_mask(attacker.tile, attacker.rules.attack_range)
+                if in_range & targets[1 - attacker.player_index]:
+                    target = self._pick_target(attacker, in_range, mobiles_at, mobile_masks, structure_at, structure_masks, center)
+                    if target is not None:
+                        strikes.append((attacker, target))
+            for attacker, target in strikes:
+                if target.rules.stationary:
+                    damage = attacker.rules.damage_f
+                    result.structure_damage[attacker.player_index] += damage
+                else:
+                    damage = attacker.rules.damage_i
+                target.health -= damage
+                result.damage_dealt[attacker.player_index] += damage
+
+            # Destroyed units are removed, and units re-path if the structure layout changed
+            mobiles = [unit for unit in mobiles if unit.health > 0]
+            destroyed = False
+            for tile, structure in list(structure_at.items()):
+                if structure.health <= 0:
+                    del structure_at[tile]
+                    structure_masks[structure.player_index] &= ~(1 << tile)
+                    structures &= ~(1 << tile)
+                    result.destroyed.append([[structure.x, structure.y], structure.rules.unit_type, structure.player_index])
+                    destroyed = True
+            if destroyed:
+                attackers = [entry for entry in attackers if entry[0].health > 0]
+                for unit in mobiles:
+                    unit.path = None
+
+            if record_frames:
+                result.frame_units.append({unit.order: (unit.x, unit.y, unit.health) for unit in mobiles})
+                result.frame_structures.append({tile: structure.health for tile, structure in structure_at.items()})
+
+        result.frames = frame
+        result.remaining = len(mobiles)
+        return result
+
+    def _pick_target(self, attacker, in_range, mobiles_at, mobile_masks, structure_at, structure_masks, center):
+        """The unit get_target would pick for attacker, or None"""
+        rules = attacker.rules
+        enemy = 1 - attacker.player_index
+        size = self._size
+        best = None
+        best_key = None
+        # get_target prefers mobile units, so structures are only looked at when no mobile unit is in range
+        hits = in_range & mobile_masks[enemy] if rules.damage_i else 0
+        if hits:
+            candidates_at = mobiles_at
+        else:
+            hits = in_range & structure_masks[enemy] if rules.damage_f else 0
+            candidates_at = None
+        y_sign = 1 if attacker.player_index == 0 else -1
+        while hits:
+            low_bit = hits & -hits
+            hits ^= low_bit
+            tile = low_bit.bit_length() - 1
+            x = tile // size
+            y = tile % size
+            distance = (x - attacker.x) ** 2 + (y - attacker.y) ** 2
+            x_distance = -abs(center - x)
+            # Tiles are visited in get_locations_in_range order, and units on a tile in list order, so ties keep the first
+            for unit in (candidates_at[tile] if candidates_at is not None else (structure_at[tile],)):
+                if unit.player_index != enemy:
+                    continue
+                key = (distance, unit.health, y_sign * y, x_distance)
+                if best_key is None or key < best_key:
+                    best = unit
+                    best_key = key
+        return best
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark for turn state parsing, run on the turn states recorded in replay files.
+
+Every turn state is parsed the way the AlgoCore loop used to handle it, decoding the json once to
+read turnInfo and then handing the string to GameState which decoded it again, and the way it does
+now, decoding once and building the GameState from the dict. Each variant is repeated and the best
+time per turn state is kept, so the numbers are not skewed by the first calls warming up caches.
+
+Pointing --algo at an older gamelib whose GameState only accepts strings measures the decoded twice
+variant alone, which gives the baseline to compare the unit parsing against.
+
+Usage:
+    python scripts/benchmark_parsing.py [--algo python-starter-algo] [--repeat 20] replays/*.replay
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmark_pathing import load_boards, format_latencies
+
+file_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(file_dir, os.pardir))
+
+
+def best_time(function, repeat):
+    """Returns the fastest of repeat calls to function, in seconds
+
+    """
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - began
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="+", help="replay files to read turn states from")
+    parser.add_argument("--algo", default=os.path.join(parent_dir, "python-starter-algo"),
+                        help="algo folder whose gamelib should be benchmarked")
+    parser.add_argument("--repeat", type=int, default=20, help="times each turn state is parsed, the best time is kept")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.algo))
+    import gamelib
+
+    accepts_dict = True
+    decode_latencies = []
+    string_latencies = []
+    dict_latencies = []
+    units = 0
+    for replay_path in args.replays:
+        config, turn_states = load_boards(replay_path)
+        if config is None:
+            print("Skipping {}, no config line found".format(replay_path))
+            continue
+        for turn_state in turn_states:
+            state = json.loads(turn_state)
+            units += sum(len(unit_list) for unit_list in state["p1Units"] + state["p2Units"])
+
+            def decode():
+                json.loads(turn_state)["turnInfo"]
+
+            def decode_twice():
+                json.loads(turn_state)["turnInfo"]
+                gamelib.GameState(config, turn_state)
+
+            def decode_once():
+                gamelib.GameState(config, json.loads(turn_state))
+
+            decode_latencies.append(best_time(decode, args.repeat))
+            string_latencies.append(best_time(decode_twice, args.repeat))
+            if accepts_dict:
+                try:
+                    dict_latencies.append(best_time(decode_once, args.repeat))
+                except TypeError:
+                    accepts_dict = False
+
+    if not string_latencies:
+        print("No turn states found")
+        return 1
+    print("Turn states: {}, units: {}, latencies in ms".format(len(string_latencies), units))
+    print("json.loads only:      {}".format(format_latencies(decode_latencies)))
+    print("Decoded twice:        {}".format(format_latencies(string_latencies)))
+    if not accepts_dict:
+        print("Decoded once:         not supported, this GameState only accepts strings")
+        return 0
+    print("Decoded once:         {}".format(format_latencies(dict_latencies)))
+    once_total = sum(dict_latencies)
+    print("Speedup:              {:.2f}x".format(sum(string_latencies) / once_total if once_total else float("inf")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
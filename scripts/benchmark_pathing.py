@@ -0,0 +1,171 @@
+"""
+Benchmark and conformance suite for gamelib pathfinding, run on the boards recorded in replay files.
+
+For every turn state in the given replays, GameState.find_path_to_edge is called from each unblocked
+edge tile of the arena, and every call is timed. The same paths are computed with the reference
+pathfinder (reference_navigation.py, a frozen copy of the original navigation.py) and compared
+bit for bit. A pathfinding backend is only conformant if no path differs, in which case the script
+exits with status 0.
+
+Usage:
+    python scripts/benchmark_pathing.py [--algo python-starter-algo] [--backend wavefront] replays/*.replay
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+file_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(file_dir, os.pardir))
+
+
+def load_boards(replay_path):
+    """Reads a replay file and returns (config, [turn state strings])
+
+    """
+    config = None
+    turn_states = []
+    with open(replay_path) as replay:
+        for line in replay:
+            line = line.strip()
+            if not line:
+                continue
+            if config is None and "replaySave" in line:
+                config = json.loads(line)
+            elif "turnInfo" in line and json.loads(line)["turnInfo"][0] == 0:
+                turn_states.append(line)
+    return config, turn_states
+
+
+def edge_starts(game_state):
+    """All unblocked edge tiles, each paired with the edge a unit there targets
+
+    """
+    game_map = game_state.game_map
+    starts = []
+    for edge in game_map.get_edges():
+        for location in edge:
+            if not game_state.contains_stationary_unit(location):
+                starts.append((location, game_state.get_target_edge(location)))
+    return starts
+
+
+def percentile(sorted_values, fraction):
+    """Nearest rank percentile of an already sorted list
+
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def time_reference(pathfinder, game_state, starts):
+    """Returns ([seconds per query], paths) for the reference pathfinder
+
+    """
+    latencies = []
+    paths = []
+    for location, target_edge in starts:
+        end_points = game_state.game_map.get_edge_locations(target_edge)
+        began = time.perf_counter()
+        paths.append(pathfinder.navigate_multiple_endpoints(location, end_points, game_state))
+        latencies.append(time.perf_counter() - began)
+    return latencies, paths
+
+
+def time_game_state(game_state, starts):
+    """Returns ([seconds per query], paths) for GameState.find_path_to_edge
+
+    """
+    latencies = []
+    paths = []
+    game_state.clear_path_cache()
+    for location, target_edge in starts:
+        began = time.perf_counter()
+        paths.append(game_state.find_path_to_edge(location, target_edge))
+        latencies.append(time.perf_counter() - began)
+    return latencies, paths
+
+
+def format_latencies(latencies):
+    latencies = sorted(latencies)
+    return "p50 {:7.3f}  p90 {:7.3f}  p99 {:7.3f}  max {:7.3f}".format(
+        *(1000 * value for value in (percentile(latencies, 0.5), percentile(latencies, 0.9),
+                                     percentile(latencies, 0.99), latencies[-1] if latencies else 0.0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="+", help="replay files to read boards from")
+    parser.add_argument("--algo", default=os.path.join(parent_dir, "python-starter-algo"),
+                        help="algo folder whose gamelib should be benchmarked")
+    parser.add_argument("--backend", choices=["default", "wavefront"], default="default",
+                        help="pathfinder the game states should use")
+    parser.add_argument("--no-reference", action="store_true",
+                        help="only time the backend, skipping the slow reference pathfinder and the conformance check")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary, not every layout")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.algo))
+    import gamelib
+    from reference_navigation import ShortestPathFinder as ReferencePathFinder
+    if args.backend == "wavefront":
+        from gamelib.wavefront import WavefrontPathFinder
+
+    reference_latencies = []
+    current_latencies = []
+    boards = 0
+    queries = 0
+    mismatches = 0
+    first_mismatch = None
+    for replay_path in args.replays:
+        config, turn_states = load_boards(replay_path)
+        if config is None:
+            print("Skipping {}, no config line found".format(replay_path))
+            continue
+        for turn_state in turn_states:
+            game_state = gamelib.GameState(config, turn_state)
+            game_state.suppress_warnings(True)
+            if args.backend == "wavefront":
+                game_state.set_path_finder(WavefrontPathFinder())
+            starts = edge_starts(game_state)
+            layout = "{} turn {}".format(os.path.basename(replay_path), game_state.turn_number)
+
+            latencies, paths = time_game_state(game_state, starts)
+            current_latencies += latencies
+            line = "{:32}  {:3} queries  {}".format(layout, len(starts), format_latencies(latencies))
+            if not args.no_reference:
+                reference, reference_paths = time_reference(ReferencePathFinder(), game_state, starts)
+                reference_latencies += reference
+                differing = [start for start, a, b in zip(starts, reference_paths, paths) if a != b]
+                mismatches += len(differing)
+                if differing and first_mismatch is None:
+                    first_mismatch = (layout, differing[0][0])
+                line += "  reference p50 {:7.3f}  mismatches {}".format(1000 * percentile(sorted(reference), 0.5), len(differing))
+            if not args.quiet:
+                print(line)
+            boards += 1
+            queries += len(starts)
+
+    if boards == 0:
+        print("No turn states found")
+        return 1
+    print("")
+    print("Layouts: {}, queries: {}, latencies in ms".format(boards, queries))
+    print("Current:   {}".format(format_latencies(current_latencies)))
+    if args.no_reference:
+        return 0
+    print("Reference: {}".format(format_latencies(reference_latencies)))
+    current_total = sum(current_latencies)
+    print("Speedup:   {:.2f}x".format(sum(reference_latencies) / current_total if current_total else float("inf")))
+    if mismatches:
+        print("NOT CONFORMANT: {} paths differ from the reference, first at {} from {}".format(mismatches, *first_mismatch))
+        return 1
+    print("Conformant: every path matches the reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
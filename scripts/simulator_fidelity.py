@@ -0,0 +1,256 @@
+"""
+Fidelity check of the gamelib action phase simulator against the action frames recorded in replay files.
+
+For every turn of the given replays, an ActionSimulator is seeded with the turn state and the units
+spawned in the first action frame (events.spawn): structures are added to the board, upgrades are
+applied and mobile units are deployed. The simulated frames are then compared with the recorded ones.
+Mobile units are matched by their spawn id and structures by their tile, and a unit diverges when its
+position or health differs, or when it is alive on one side only. Every turn gets a line with its
+divergence statistics and the first frame that diverged, followed by a summary of the whole corpus.
+
+Replays are checked in parallel, one worker process per replay. With --threshold the script exits
+with status 1 when the share of divergent frames is above it, so fidelity regressions can fail a
+check as the simulator is optimized.
+
+Usage:
+    python scripts/simulator_fidelity.py [--algo python-starter-algo] [--jobs 4] [--threshold 0.05] replays/*.replay
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+file_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(file_dir, os.pardir))
+
+
+def load_turns(replay_path):
+    """Reads a replay file and returns (config, [(turn state, [action frames])]), the states and frames being decoded dicts
+
+    """
+    config = None
+    turns = []
+    with open(replay_path) as replay:
+        for line in replay:
+            line = line.strip()
+            if not line:
+                continue
+            if config is None and "replaySave" in line:
+                config = json.loads(line)
+                continue
+            if "turnInfo" not in line:
+                continue
+            state = json.loads(line)
+            phase, turn_number = state["turnInfo"][0], state["turnInfo"][1]
+            if phase == 0:
+                turns.append((state, []))
+            elif phase == 1 and turns and turns[-1][0]["turnInfo"][1] == turn_number:
+                turns[-1][1].append(state)
+    return config, turns
+
+
+def recorded_units(frame, arena_size):
+    """Returns ({spawn id: (x, y, health)} of the mobile units, {tile: health} of the structures) in a recorded frame
+
+    """
+    mobiles = {}
+    structures = {}
+    for units_key in ("p1Units", "p2Units"):
+        # The lists after the six unit types hold removals and upgrades, not units
+        for type_index, units in enumerate(frame[units_key][:6]):
+            for unit in units:
+                x, y, health = unit[0], unit[1], unit[2]
+                if type_index >= 3:
+                    mobiles[str(unit[3])] = (x, y, health)
+                else:
+                    structures[x * arena_size + y] = health
+    return mobiles, structures
+
+
+def seed_turn(gamelib, config, turn_state, first_frame):
+    """Builds the board the action phase of a turn starts from
+
+    Returns:
+        (game_state, deploys, enemy_deploys, spawn ids), the spawn ids being in the simulator's spawn order
+
+    """
+    game_state = gamelib.GameState(config, turn_state)
+    game_state.suppress_warnings(True)
+    shorthands = [information.get("shorthand") for information in config["unitInformation"]]
+    deploys = ([], [])
+    spawn_ids = ([], [])
+    for location, type_index, unit_id, player in first_frame["events"]["spawn"]:
+        player_index = 0 if player == 1 else 1
+        unit_type = shorthands[type_index]
+        if type_index < 3:
+            game_state.game_map.add_unit(unit_type, location, player_index)
+        elif type_index < 6:
+            deploys[player_index].append((unit_type, location, 1))
+            spawn_ids[player_index].append(str(unit_id))
+        elif type_index == 7:
+            game_state.game_map.upgrade_unit(location)
+        # Removals only take effect once the action phase is over
+    return game_state, deploys[0], deploys[1], spawn_ids[0] + spawn_ids[1]
+
+
+def compare_frame(recorded, simulated, tolerance):
+    """Counts the (position, health, death) differences between a recorded and a simulated frame
+
+    """
+    recorded_mobiles, recorded_structures = recorded
+    simulated_mobiles, simulated_structures = simulated
+    positions = healths = deaths = 0
+    for unit_id in set(recorded_mobiles) | set(simulated_mobiles):
+        if unit_id not in recorded_mobiles or unit_id not in simulated_mobiles:
+            deaths += 1
+            continue
+        x, y, health = recorded_mobiles[unit_id]
+        simulated_x, simulated_y, simulated_health = simulated_mobiles[unit_id]
+        if (x, y) != (simulated_x, simulated_y):
+            positions += 1
+        if abs(health - simulated_health) > tolerance:
+            healths += 1
+    for tile in set(recorded_structures) | set(simulated_structures):
+        if tile not in recorded_structures or tile not in simulated_structures:
+            deaths += 1
+        elif abs(recorded_structures[tile] - simulated_structures[tile]) > tolerance:
+            healths += 1
+    return positions, healths, deaths
+
+
+def check_turn(gamelib, config, turn_state, frames, tolerance):
+    """Simulates the action phase of one turn and compares it with its recorded frames
+
+    Returns:
+        A dict of divergence statistics for the turn
+
+    """
+    frames = sorted(frames, key=lambda frame: frame["turnInfo"][2])
+    game_state, deploys, enemy_deploys, spawn_ids = seed_turn(gamelib, config, turn_state, frames[0])
+    arena_size = game_state.ARENA_SIZE
+    result = gamelib.ActionSimulator(game_state).run(deploys, enemy_deploys, record_frames=True)
+
+    # The first frame holds the spawns, the simulator's first frame is the first recorded frame after it
+    recorded = {frame["turnInfo"][2]: recorded_units(frame, arena_size) for frame in frames}
+    first_recorded = frames[0]["turnInfo"][2]
+    last_recorded = frames[-1]["turnInfo"][2]
+    initial_structures = recorded[first_recorded][1]
+    stats = {"turn": turn_state["turnInfo"][1], "frames": 0, "divergent_frames": 0, "first_divergent_frame": None,
+             "position_errors": 0, "health_errors": 0, "death_errors": 0,
+             "recorded_breaches": sum(len(frame["events"]["breach"]) for frame in frames), "simulated_breaches": len(result.breaches)}
+    for offset in range(1, max(last_recorded - first_recorded, result.frames) + 1):
+        frame_number = first_recorded + offset
+        # Past the end of either side, its last frame stands with no mobile units left
+        recorded_frame = recorded.get(frame_number, ({}, recorded[last_recorded][1]))
+        if offset <= result.frames:
+            simulated_units = {spawn_ids[index]: unit for index, unit in result.frame_units[offset - 1].items()}
+            simulated_frame = (simulated_units, result.frame_structures[offset - 1])
+        else:
+            simulated_frame = ({}, result.frame_structures[-1] if result.frame_structures else initial_structures)
+        positions, healths, deaths = compare_frame(recorded_frame, simulated_frame, tolerance)
+        stats["frames"] += 1
+        stats["position_errors"] += positions
+        stats["health_errors"] += healths
+        stats["death_errors"] += deaths
+        if positions or healths or deaths:
+            stats["divergent_frames"] += 1
+            if stats["first_divergent_frame"] is None:
+                stats["first_divergent_frame"] = frame_number
+    return stats
+
+
+_GAMELIB = None
+
+
+def _init_worker(algo_path):
+    global _GAMELIB
+    sys.path.insert(0, os.path.abspath(algo_path))
+    import gamelib
+    _GAMELIB = gamelib
+
+
+def check_replay(job):
+    """Checks every turn of a replay, run in a worker process
+
+    Returns:
+        (replay path, [turn statistics], error message or None)
+
+    """
+    replay_path, tolerance = job
+    try:
+        config, turns = load_turns(replay_path)
+        if config is None:
+            return replay_path, [], "no config line found"
+        return replay_path, [check_turn(_GAMELIB, config, turn_state, frames, tolerance)
+                             for turn_state, frames in turns if frames], None
+    except Exception as error:
+        return replay_path, [], "{}: {}".format(type(error).__name__, error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("replays", nargs="+", help="replay files to check the simulator against")
+    parser.add_argument("--algo", default=os.path.join(parent_dir, "python-starter-algo"),
+                        help="algo folder whose gamelib simulator should be checked")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="number of replays checked at once")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="largest health difference that is not a divergence")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="exit with status 1 if the share of divergent frames is above this, between 0 and 1")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary, not every turn")
+    args = parser.parse_args()
+
+    jobs = [(replay_path, args.tolerance) for replay_path in args.replays]
+    if args.jobs > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(args.jobs, len(jobs)), initializer=_init_worker, initargs=(args.algo,))
+        results = pool.imap(check_replay, jobs)
+    else:
+        pool = None
+        _init_worker(args.algo)
+        results = map(check_replay, jobs)
+
+    totals = {"turns": 0, "exact_turns": 0, "frames": 0, "divergent_frames": 0, "position_errors": 0, "health_errors": 0,
+              "death_errors": 0, "recorded_breaches": 0, "simulated_breaches": 0}
+    first_divergent_frames = []
+    for replay_path, turns, error in results:
+        name = os.path.basename(replay_path)
+        if error is not None:
+            print("Skipping {}, {}".format(name, error))
+            continue
+        for stats in turns:
+            totals["turns"] += 1
+            totals["exact_turns"] += stats["divergent_frames"] == 0
+            for key in ("frames", "divergent_frames", "position_errors", "health_errors", "death_errors", "recorded_breaches", "simulated_breaches"):
+                totals[key] += stats[key]
+            if stats["first_divergent_frame"] is not None:
+                first_divergent_frames.append(stats["first_divergent_frame"])
+            if not args.quiet:
+                print("{:32}  turn {:3}  frames {:3}  divergent {:3}  first {:>4}  position {:4}  health {:4}  deaths {:4}  breaches {}/{}".format(
+                    name, stats["turn"], stats["frames"], stats["divergent_frames"],
+                    "-" if stats["first_divergent_frame"] is None else stats["first_divergent_frame"],
+                    stats["position_errors"], stats["health_errors"], stats["death_errors"],
+                    stats["recorded_breaches"], stats["simulated_breaches"]))
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if totals["turns"] == 0:
+        print("No action phases found")
+        return 1
+    divergent_share = totals["divergent_frames"] / totals["frames"] if totals["frames"] else 0.0
+    print("")
+    print("Turns: {}, exact: {} ({:.1%})".format(totals["turns"], totals["exact_turns"], totals["exact_turns"] / totals["turns"]))
+    print("Frames: {}, divergent: {} ({:.1%})".format(totals["frames"], totals["divergent_frames"], divergent_share))
+    print("Unit frame errors: position {}, health {}, deaths {}".format(totals["position_errors"], totals["health_errors"], totals["death_errors"]))
+    print("Breaches: recorded {}, simulated {}".format(totals["recorded_breaches"], totals["simulated_breaches"]))
+    if first_divergent_frames:
+        first_divergent_frames.sort()
+        print("First divergent frame: earliest {}, median {}".format(first_divergent_frames[0], first_divergent_frames[len(first_divergent_frames) // 2]))
+    if args.threshold is not None and divergent_share > args.threshold:
+        print("NOT FAITHFUL: {:.1%} of frames diverge, above the threshold of {:.1%}".format(divergent_share, args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())